@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for anki.py
+Generates synthetic card folders and measures how fast anki.py processes them:
+- parse: cards/sec for reading and rendering cards with 1..N worker processes
+- render: golden-output checks and a micro-benchmark of the markdown renderer
+  against the original regex chain
+- sync: full syncs against an in-process fake AnkiConnect (cards/sec, RPC
+  count and bytes sent), so no running Anki is needed
+- serve: run the fake AnkiConnect on its own to point anki.py at it
+"""
+
+import os
+import re
+import io
+import sys
+import json
+import time
+import base64
+import random
+import shutil
+import fnmatch
+import tempfile
+import threading
+import contextlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# anki.py lives next to this script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import anki  # noqa: E402
+
+WORDS = (
+    "audit control budget ledger revenue expense account balance entry report "
+    "variable function module request response cache index parser token stream"
+).split()
+
+
+# Markdown -> expected Anki HTML. Cases marked legacy=True render the same
+# with the original regex chain; the others pin down documented fixes
+GOLDEN_CASES = [
+    ("# Title", "<b>Title</b>", True),
+    ("### **Bold** header", "<b><b>Bold</b> header</b>", True),
+    ("Some **bold** and *italic* and _under_ text", "Some <b>bold</b> and <i>italic</i> and <i>under</i> text", True),
+    ("**bold with _italic_ inside**", "<b>bold with <i>italic</i> inside</b>", True),
+    ("Use `code` here", "Use <code>code</code> here", True),
+    ("- one\n- two\nafter", "<ul><br><li>one</li><br><li>two</li><br></ul><br>after", True),
+    ("intro\n- *a*\n- **b**", "intro<br><ul><br><li><i>a</i></li><br><li><b>b</b></li><br></ul>", True),
+    ("See [[Other Note]] now", "See Other Note now", True),
+    ("[site](https://example.com)", '<a href="https://example.com">site</a>', True),
+    ("Done #study #anki-card", "Done", True),
+    ("a\n\n\n\nb", "a<br><br>b", True),
+    ('<img src="x-123.png"> caption', '<img src="x-123.png"> caption', True),
+    ("  padded  \n", "padded", True),
+    # Documented differences from the regex chain
+    ("`snake_case_name`", "<code>snake_case_name</code>", False),
+    ("call my_func_name()", "call my_func_name()", False),
+    ("* first\n* second", "<ul><br><li>first</li><br><li>second</li><br></ul>", False),
+    ("`#include <stdio>`", "<code>#include <stdio></code>", False),
+    ("[docs](https://example.com/page#install)", '<a href="https://example.com/page#install">docs</a>', False),
+    ("C# and F# #lang", "C# and F#", False),
+]
+
+
+class FakeAnkiConnect:
+    """In-process stand-in for AnkiConnect with an in-memory collection
+
+    Implements the actions anki.py uses (including `multi` and `notesInfo`).
+    Requests are handled one at a time, like on Anki's main thread, after
+    sleeping `latency` seconds plus `action_latency` for every action inside
+    a `multi`. `calls` counts HTTP requests, `requests` the actions run
+    (inside `multi` too) and `bytes_received` the request bytes, so
+    benchmarks can report what a sync sent.
+    """
+
+    def __init__(self, latency=0.0, action_latency=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.action_latency = action_latency
+        self.decks = {'Default': 1}
+        self.notes = {}
+        self.media = {}
+        self.calls = 0
+        self.requests = Counter()
+        self.bytes_received = 0
+        self._next_id = 1600000000000
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                reply = fake.handle_request(body)
+                data = json.dumps(reply).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle_request(self, body):
+        """Decode one request body and run it, like AnkiConnect's API version 6"""
+        with self._lock:
+            self.calls += 1
+            self.bytes_received += len(body)
+            try:
+                request = json.loads(body)
+                action = request['action']
+                self.requests[action] += 1
+                time.sleep(self.latency)
+                return {'result': self.run(action, request.get('params', {})), 'error': None}
+            except Exception as e:
+                return {'result': None, 'error': str(e)}
+
+    def run(self, action, params):
+        handler = getattr(self, f"action_{action}", None)
+        if handler is None:
+            raise Exception('unsupported action')
+        return handler(**params)
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def _note(self, note_id):
+        if note_id not in self.notes:
+            raise Exception(f'Note was not found: {note_id}')
+        return self.notes[note_id]
+
+    def action_version(self):
+        return 6
+
+    def action_deckNames(self):
+        return list(self.decks)
+
+    def action_createDeck(self, deck):
+        return self.decks.setdefault(deck, self._new_id())
+
+    def action_multi(self, actions):
+        replies = []
+        for inner in actions:
+            self.requests[inner['action']] += 1
+            time.sleep(self.action_latency)
+            try:
+                replies.append({'result': self.run(inner['action'], inner.get('params', {})), 'error': None})
+            except Exception as e:
+                replies.append({'result': None, 'error': str(e)})
+        return replies
+
+    def action_findNotes(self, query):
+        """Only `tag:` searches (with * wildcards) are supported"""
+        query = query.strip().strip('"')
+        if not query.startswith('tag:'):
+            raise Exception(f'unsupported query: {query}')
+        pattern = query[4:].lower()
+        return [note_id for note_id, note in self.notes.items()
+                if any(fnmatch.fnmatchcase(tag.lower(), pattern) for tag in note['tags'])]
+
+    def action_notesInfo(self, notes):
+        infos = []
+        for note_id in notes:
+            note = self.notes.get(note_id)
+            if note is None:
+                infos.append({})
+                continue
+            infos.append({
+                'noteId': note_id,
+                'modelName': note['model'],
+                'tags': list(note['tags']),
+                'fields': {name: {'value': value, 'order': order}
+                           for order, (name, value) in enumerate(note['fields'].items())},
+            })
+        return infos
+
+    def action_addNote(self, note):
+        if note['deckName'] not in self.decks:
+            raise Exception(f"deck was not found: {note['deckName']}")
+        note_id = self._new_id()
+        self.notes[note_id] = {'model': note['modelName'], 'deck': note['deckName'],
+                               'fields': dict(note['fields']), 'tags': list(note.get('tags', []))}
+        return note_id
+
+    def action_updateNoteFields(self, note):
+        self._note(note['id'])['fields'].update(note['fields'])
+
+    def action_addTags(self, notes, tags):
+        for note_id in notes:
+            note = self._note(note_id)
+            note['tags'] += [tag for tag in tags.split() if tag not in note['tags']]
+
+    def action_removeTags(self, notes, tags):
+        removed = set(tags.split())
+        for note_id in notes:
+            note = self._note(note_id)
+            note['tags'] = [tag for tag in note['tags'] if tag not in removed]
+
+    def action_deleteNotes(self, notes):
+        for note_id in notes:
+            self.notes.pop(note_id, None)
+
+    def action_clearUnusedTags(self):
+        return None
+
+    def action_getMediaFilesNames(self, pattern='*'):
+        return [name for name in self.media if fnmatch.fnmatchcase(name, pattern)]
+
+    def action_storeMediaFile(self, filename, data=None, path=None, url=None, deleteExisting=True):
+        if data is not None:
+            self.media[filename] = len(base64.b64decode(data))
+        elif path is not None:
+            self.media[filename] = os.path.getsize(path)
+        else:
+            raise Exception('storeMediaFile needs data or path')
+        return filename
+
+
+def legacy_clean_markdown(text):
+    """The original regex-chain renderer, kept as the benchmark baseline"""
+    text = re.sub(r'^---\s*\n.*?\n---\s*\n', '', text, flags=re.DOTALL)
+    text = re.sub(r'^#{1,6}\s+(.+)$', r'<b>\1</b>', text, flags=re.MULTILINE)
+    text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
+    text = re.sub(r'(?<!\*)\*([^*]+?)\*(?!\*)', r'<i>\1</i>', text)
+    text = re.sub(r'_(.+?)_', r'<i>\1</i>', text)
+    text = re.sub(r'`(.+?)`', r'<code>\1</code>', text)
+
+    lines = text.split('\n')
+    in_list = False
+    result_lines = []
+    for line in lines:
+        if re.match(r'^\s*[-*]\s+', line):
+            if not in_list:
+                result_lines.append('<ul>')
+                in_list = True
+            item = re.sub(r'^\s*[-*]\s+', '', line)
+            result_lines.append(f'<li>{item}</li>')
+        else:
+            if in_list:
+                result_lines.append('</ul>')
+                in_list = False
+            result_lines.append(line)
+    if in_list:
+        result_lines.append('</ul>')
+    text = '\n'.join(result_lines)
+
+    text = re.sub(r'\[\[(.+?)\]\]', r'\1', text)
+    text = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', text)
+    text = re.sub(r'#[a-zA-Z0-9_-]+', '', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = text.strip()
+    return text.replace('\n', '<br>')
+
+
+def sentence(rng, words=12):
+    """A random sentence with some inline markdown sprinkled in"""
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.08:
+            word = f"**{word}**"
+        elif roll < 0.14:
+            word = f"*{word}*"
+        elif roll < 0.20:
+            word = f"`{word}_{rng.choice(WORDS)}`"
+        elif roll < 0.24:
+            word = f"[[{word.title()}]]"
+        parts.append(word)
+    return ' '.join(parts).capitalize() + '.'
+
+
+def generate_cards(vault_path, count, images=False, seed=42):
+    """Write `count` synthetic cards to <vault>/anki (and media/ if images)"""
+    rng = random.Random(seed)
+    anki_dir = os.path.join(vault_path, anki.ANKI_FOLDER)
+    media_dir = os.path.join(vault_path, anki.MEDIA_FOLDER)
+    os.makedirs(anki_dir, exist_ok=True)
+
+    image_names = []
+    if images:
+        os.makedirs(media_dir, exist_ok=True)
+        for i in range(max(1, count // 10)):
+            name = f"diagram-{i}.png"
+            with open(os.path.join(media_dir, name), 'wb') as f:
+                f.write(b'\x89PNG\r\n\x1a\n' + rng.randbytes(4096))
+            image_names.append(name)
+
+    for i in range(count):
+        front = [sentence(rng) for _ in range(rng.randint(1, 3))]
+        back = [f"## {rng.choice(WORDS).title()}"]
+        back += [f"- {sentence(rng, 6)}" for _ in range(rng.randint(2, 8))]
+        back += [sentence(rng) for _ in range(rng.randint(1, 4))]
+        back.append("#study #" + rng.choice(WORDS))
+        if image_names:
+            back.append(f"![[{rng.choice(image_names)}]]")
+
+        subfolder = os.path.join(anki_dir, f"topic-{i % 20}")
+        os.makedirs(subfolder, exist_ok=True)
+        with open(os.path.join(subfolder, f"card-{i:05d}.md"), 'w', encoding='utf-8') as f:
+            f.write(f"---\nid: bench-{i}\n---\n\nFront:\n" + '\n'.join(front)
+                    + "\n\nBack:\n" + '\n'.join(back) + '\n')
+
+
+def card_files(vault_path):
+    """All card files in the synthetic vault, in sync order"""
+    paths = []
+    for root, _, files in os.walk(os.path.join(vault_path, anki.ANKI_FOLDER)):
+        for file in files:
+            if file.endswith('.md'):
+                paths.append(os.path.join(root, file))
+    return paths
+
+
+def bench_parse(vault_path, jobs):
+    """Cards/sec for reading and rendering every card with `jobs` workers"""
+    paths = card_files(vault_path)
+    media_cache = anki.MediaCache(transfer='stream')
+
+    started = time.perf_counter()
+    executor, scan = anki.create_scan_executor(jobs, vault_path, {}, {}, {}, media_cache, full=True)
+    with executor:
+        records = list(executor.map(scan, paths, chunksize=64 if jobs > 1 else 1))
+    elapsed = time.perf_counter() - started
+
+    cards = sum(len(record['cards']) for record in records if record['state'] == 'card')
+    return cards, elapsed
+
+
+def check_golden():
+    """Compare the renderer with GOLDEN_CASES; returns the number of failures"""
+    failures = 0
+    for markdown, expected, matches_legacy in GOLDEN_CASES:
+        html, _ = anki.clean_markdown(markdown)
+        if html != expected:
+            failures += 1
+            print(f"❌ {markdown!r}\n   expected {expected!r}\n   got      {html!r}")
+        if matches_legacy and legacy_clean_markdown(markdown) != expected:
+            failures += 1
+            print(f"❌ {markdown!r} no longer matches the legacy renderer")
+    print(f"{'✅' if not failures else '❌'} Golden cases: {len(GOLDEN_CASES) - failures}/{len(GOLDEN_CASES)} passed")
+    return failures
+
+
+def bench_render(texts, render, repeat):
+    """Seconds to render every text `repeat` times"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            render(text)
+    return time.perf_counter() - started
+
+
+def run_render(args):
+    failures = check_golden()
+    if args.check_only:
+        sys.exit(1 if failures else 0)
+
+    rng = random.Random(args.seed)
+    texts = []
+    for _ in range(args.texts):
+        lines = [f"## {rng.choice(WORDS).title()}"]
+        lines += [f"- {sentence(rng, 6)}" for _ in range(rng.randint(2, 8))]
+        lines += [sentence(rng) for _ in range(rng.randint(2, 6))]
+        texts.append('\n'.join(lines))
+
+    legacy = bench_render(texts, legacy_clean_markdown, args.repeat)
+    current = bench_render(texts, lambda text: anki.clean_markdown(text)[0], args.repeat)
+    total = args.texts * args.repeat
+    print(f"{'renderer':>10} {'seconds':>9} {'texts/sec':>10}")
+    print(f"{'legacy':>10} {legacy:>9.2f} {total / legacy:>10.0f}")
+    print(f"{'current':>10} {current:>9.2f} {total / current:>10.0f}")
+    print(f"⚡ Speedup: {legacy / current:.2f}x")
+    sys.exit(1 if failures else 0)
+
+
+def run_parse(args):
+    vault_path = args.folder or tempfile.mkdtemp(prefix='anki-bench-')
+    try:
+        if not os.path.exists(os.path.join(vault_path, anki.ANKI_FOLDER)):
+            print(f"🏗️  Generating {args.cards} cards in {vault_path}...")
+            generate_cards(vault_path, args.cards, images=args.images)
+
+        print(f"{'jobs':>6} {'cards':>8} {'seconds':>9} {'cards/sec':>10}")
+        for jobs in args.jobs:
+            cards, elapsed = bench_parse(vault_path, jobs)
+            print(f"{jobs:>6} {cards:>8} {elapsed:>9.2f} {cards / elapsed:>10.0f}")
+    finally:
+        if not args.folder and not args.keep:
+            shutil.rmtree(vault_path, ignore_errors=True)
+
+
+def bench_sync(fake, vault_path, manifest_path, args):
+    """One sync_to_anki run against `fake`: (seconds, requests, actions, bytes sent)"""
+    calls_before = fake.calls
+    actions_before = sum(fake.requests.values())
+    bytes_before = fake.bytes_received
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        anki.sync_to_anki(vault_path, anki.DECK_NAME, batch_size=args.batch_size,
+                          manifest_path=manifest_path, concurrency=args.concurrency,
+                          jobs=args.jobs, target_latency=args.target_latency)
+    elapsed = time.perf_counter() - started
+
+    return (elapsed, fake.calls - calls_before, sum(fake.requests.values()) - actions_before,
+            fake.bytes_received - bytes_before)
+
+
+def run_sync(args):
+    anki.MEDIA_TRANSFER = args.transfer
+    image_modes = {'off': [False], 'on': [True], 'both': [False, True]}[args.images]
+
+    print(f"{'cards':>7} {'images':>7} {'run':>7} {'seconds':>9} {'cards/sec':>10} "
+          f"{'RPCs':>6} {'actions':>8} {'KB sent':>9} {'notes':>7}")
+    for count in args.cards:
+        for images in image_modes:
+            work_path = tempfile.mkdtemp(prefix='anki-bench-')
+            try:
+                vault_path = os.path.join(work_path, 'vault')
+                generate_cards(vault_path, count, images=images)
+                manifest_path = os.path.join(work_path, 'manifest.json')
+
+                with FakeAnkiConnect(args.latency / 1000, args.action_latency / 1000) as fake:
+                    fake.decks[anki.DECK_NAME] = 1
+                    anki.ANKI_CONNECT_URL = fake.url
+
+                    # A first sync creates every note; the resync finds nothing to do
+                    for run in ('first', 'resync'):
+                        elapsed, calls, actions, sent = bench_sync(fake, vault_path, manifest_path, args)
+                        print(f"{count:>7} {'yes' if images else 'no':>7} {run:>7} {elapsed:>9.2f} "
+                              f"{count / elapsed:>10.0f} {calls:>6} {actions:>8} {sent / 1024:>9.0f} "
+                              f"{len(fake.notes):>7}")
+            finally:
+                shutil.rmtree(work_path, ignore_errors=True)
+
+
+def run_serve(args):
+    fake = FakeAnkiConnect(args.latency / 1000, args.action_latency / 1000, port=args.port)
+    print(f"🔌 Fake AnkiConnect listening on {fake.url} (Ctrl+C to stop)")
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._server.server_close()
+    print(f"📊 {fake.calls} requests, {len(fake.notes)} notes, "
+          f"{len(fake.media)} media files, {fake.bytes_received / 1024:.0f} KB received")
+
+
+def main():
+    """Main entry point with CLI argument parsing"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark anki.py on synthetic card folders')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parse_parser = subparsers.add_parser('parse', help='Cards/sec for parsing and rendering vs --jobs')
+    parse_parser.add_argument('--cards', type=int, default=10000, help='Number of synthetic cards (default: 10000)')
+    parse_parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8], help='Worker counts to compare')
+    parse_parser.add_argument('--images', action='store_true', help='Reference synthetic images from the cards')
+    parse_parser.add_argument('--folder', help='Use (or generate into) this vault folder instead of a temp dir')
+    parse_parser.add_argument('--keep', action='store_true', help='Keep the generated temp folder')
+    parse_parser.set_defaults(func=run_parse)
+
+    render_parser = subparsers.add_parser('render', help='Golden checks and renderer micro-benchmark')
+    render_parser.add_argument('--texts', type=int, default=2000, help='Synthetic texts to render (default: 2000)')
+    render_parser.add_argument('--repeat', type=int, default=5, help='Times to render each text (default: 5)')
+    render_parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic texts')
+    render_parser.add_argument('--check-only', action='store_true', help='Only run the golden-output checks')
+    render_parser.set_defaults(func=run_render)
+
+    sync_parser = subparsers.add_parser('sync', help='Full syncs against an in-process fake AnkiConnect')
+    sync_parser.add_argument('--cards', type=int, nargs='+', default=[100, 1000, 10000],
+                             help='Folder sizes to sync (default: 100 1000 10000)')
+    sync_parser.add_argument('--images', choices=['off', 'on', 'both'], default='both',
+                             help='Sync folders without images, with images, or both (default: both)')
+    sync_parser.add_argument('--transfer', choices=['auto', 'path', 'stream'], default='stream',
+                             help='Media transfer mode (default: stream, as with a remote Anki)')
+    sync_parser.add_argument('--latency', type=float, default=0.0, help='Fake latency per request in ms')
+    sync_parser.add_argument('--action-latency', type=float, default=0.0,
+                             help='Fake latency per action inside a multi request, in ms')
+    sync_parser.add_argument('--batch-size', type=int, default=anki.BATCH_SIZE, help='Passed to sync_to_anki')
+    sync_parser.add_argument('--concurrency', type=int, default=anki.CONCURRENCY, help='Passed to sync_to_anki')
+    sync_parser.add_argument('--jobs', type=int, default=anki.JOBS, help='Passed to sync_to_anki')
+    sync_parser.add_argument('--target-latency', type=float, default=anki.TARGET_LATENCY_MS,
+                             help='Passed to sync_to_anki (ms, default: off)')
+    sync_parser.set_defaults(func=run_sync)
+
+    serve_parser = subparsers.add_parser('serve', help='Run the fake AnkiConnect until Ctrl+C')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    serve_parser.add_argument('--latency', type=float, default=0.0, help='Fake latency per request in ms')
+    serve_parser.add_argument('--action-latency', type=float, default=0.0,
+                              help='Fake latency per action inside a multi request, in ms')
+    serve_parser.set_defaults(func=run_serve)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
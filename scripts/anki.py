@@ -10,10 +10,22 @@ Converts markdown files from the anki folder into Anki flashcards using AnkiConn
 import os
 import json
 import re
+import asyncio
 import base64
-import urllib.request
+import contextlib
 import hashlib
+import http.client
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import unquote, urlparse
 from datetime import datetime
 
 # Configuration
@@ -27,33 +39,438 @@ DECK_NAME = "Obsidian Notes"
 # AnkiConnect configuration
 ANKI_CONNECT_URL = "http://localhost:8765"
 
+# Seconds to wait for an AnkiConnect response before giving up, with
+# per-action overrides ('version' is the reachability probe, so it fails fast)
+ANKI_CONNECT_TIMEOUT = 60
+ANKI_CONNECT_TIMEOUTS = {'version': 5}
+
+# Retries for a request that couldn't reach AnkiConnect or timed out, waiting
+# ANKI_CONNECT_BACKOFF seconds before the first one and doubling each time
+ANKI_CONNECT_RETRIES = 3
+ANKI_CONNECT_BACKOFF = 0.5
+
+# Actions that create something, so a request that may have reached Anki
+# before timing out is not sent again
+NON_IDEMPOTENT_ACTIONS = {'addNote', 'addNotes'}
+
+# Idle keep-alive connections kept open to AnkiConnect
+ANKI_CONNECT_POOL_SIZE = 2
+
+# Upper bounds (ms) of the per-action request latency histogram; slower
+# requests land in a final overflow bucket
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Number of notes sent per AnkiConnect `multi` request
+BATCH_SIZE = 50
+
+# Adaptive throttling (--target-latency): keep each AnkiConnect request
+# around this many milliseconds so Anki's UI stays responsive (0 = off).
+# When even single-note requests are slower, a pause of up to
+# MAX_THROTTLE_PAUSE seconds is left between requests
+TARGET_LATENCY_MS = 0
+MAX_THROTTLE_PAUSE = 2.0
+
+# Maximum AnkiConnect requests in flight at once. AnkiConnect handles
+# requests one at a time on Anki's main thread, so keep this small
+CONCURRENCY = 2
+
+# Threads reading and rendering card files while requests are in flight
+PARSE_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+# Worker processes for parsing/rendering (1 = threads in this process)
+JOBS = 1
+
+# Tag prefix used to track which Anki note belongs to which markdown file
+ID_TAG_PREFIX = "obsidian-id-"
+
+# Local record of what was last synced, used to skip unchanged files
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "anki-manifest.json")
+MANIFEST_VERSION = 1
+
+# Seconds between fsyncs of the checkpoint journal (it is flushed after
+# every batch regardless)
+CHECKPOINT_INTERVAL = 5
+
+# Length of the content hash appended to uploaded media file names
+MEDIA_HASH_LENGTH = 12
+
+# How media reaches AnkiConnect: 'path' lets a local Anki read the file
+# itself, 'stream' base64-encodes it into the request body chunk by chunk,
+# 'auto' picks 'path' whenever ANKI_CONNECT_URL points at this machine
+MEDIA_TRANSFER = "auto"
+
+# Bytes read per chunk when streaming media (a multiple of 3 keeps the
+# base64 chunks concatenable)
+MEDIA_CHUNK_SIZE = 3 * 64 * 1024
+
+# Watch mode: seconds between scans of anki/ and media/, and how long the
+# folders must stay quiet before a burst of edits is synced
+WATCH_INTERVAL = 2.0
+WATCH_DEBOUNCE = 1.5
+
+# Quiet mode (--quiet): progress bar width and minimum seconds between
+# redraws (or between writes of the card list without it). Console output
+# is written in chunks of at most about OUTPUT_BUFFER_SIZE characters
+# instead of line by line
+PROGRESS_WIDTH = 30
+PROGRESS_INTERVAL = 0.1
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+# Offline export (--backend apkg): package written instead of calling
+# AnkiConnect, and the note type its notes use
+APKG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "anki-export.apkg")
+APKG_MODEL_NAME = "Obsidian Basic"
+
+
+class AnkiConnectClient:
+    """Keep-alive HTTP client for AnkiConnect
+
+    Idle connections are kept in a small pool and reused, so a sync doesn't
+    pay a TCP connect/teardown per request. A pooled connection the server
+    has closed in the meantime is replaced and the request retried once.
+    Per-action call counts, latencies (with a histogram over
+    LATENCY_BUCKETS_MS) and bytes sent/received are kept in `stats`, and
+    the actions sent inside `multi` requests in `multi_actions`.
+    """
+
+    # Errors that mean a reused connection was already closed by the server
+    STALE_CONNECTION_ERRORS = (
+        http.client.RemoteDisconnected,
+        http.client.BadStatusLine,
+        BrokenPipeError,
+        ConnectionResetError,
+        ConnectionAbortedError,
+    )
+
+    def __init__(self, url=None, timeout=None, pool_size=None):
+        self.url = url or ANKI_CONNECT_URL
+        parsed = urlparse(self.url)
+        self.connection_class = (
+            http.client.HTTPSConnection if parsed.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port
+        self.path = parsed.path or '/'
+        self.timeout = timeout or ANKI_CONNECT_TIMEOUT
+        self.pool_size = pool_size or ANKI_CONNECT_POOL_SIZE
+        self.keep_alive = True
+        self.stats = {}
+        self.multi_actions = Counter()
+        self._idle = []
+        self._stale_reuses = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        """Return (connection, reused) from the pool or a new connection"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self.connection_class(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, connection, reusable):
+        with self._lock:
+            if reusable and self.keep_alive and len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _record(self, action, seconds, failed=False, sent=0, received=0):
+        bucket = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if seconds * 1000 <= bound:
+                bucket = i
+                break
+
+        with self._lock:
+            entry = self.stats.setdefault(action, {
+                'calls': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                'bytes_sent': 0, 'bytes_received': 0,
+                'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            })
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['bytes_sent'] += sent
+            entry['bytes_received'] += received
+            entry['histogram'][bucket] += 1
+            if failed:
+                entry['errors'] += 1
+
+    def count_multi_actions(self, actions):
+        with self._lock:
+            self.multi_actions.update(actions)
+
+    def reset_stats(self):
+        """Start counting from zero, e.g. at the start of a sync"""
+        with self._lock:
+            self.stats = {}
+            self.multi_actions = Counter()
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def post(self, body, content_length=None, action='request', timeout=None):
+        """POST a body and return the decoded JSON response
+
+        `body` is bytes, or a zero-argument callable returning an iterable of
+        byte chunks (which then requires `content_length`) so it can be
+        streamed and, if needed, re-sent on a fresh connection. `timeout`
+        overrides the client's timeout for this call only.
+        """
+        headers = {'Content-Type': 'application/json'}
+        if content_length is None:
+            content_length = len(body)
+        headers['Content-Length'] = str(content_length)
+
+        started = time.perf_counter()
+        for attempt in range(2):
+            connection, reused = self._acquire()
+            connection.timeout = timeout or self.timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(connection.timeout)
+            try:
+                connection.request('POST', self.path,
+                                   body=body() if callable(body) else body,
+                                   headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except self.STALE_CONNECTION_ERRORS as e:
+                connection.close()
+                if reused and attempt == 0:
+                    self._note_stale_reuse()
+                    continue
+                self._record(action, time.perf_counter() - started, failed=True,
+                             sent=content_length)
+                raise ConnectionError(e) from e
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                self._record(action, time.perf_counter() - started, failed=True,
+                             sent=content_length)
+                raise ConnectionError(e) from e
+
+            if reused:
+                self._stale_reuses = 0
+            self._release(connection, not response.will_close)
+            self._record(action, time.perf_counter() - started, failed=response.status != 200,
+                         sent=content_length, received=len(data))
+
+            if response.status != 200:
+                raise ConnectionError(f'HTTP {response.status} {response.reason}')
+            return json.loads(data)
+
+    def _note_stale_reuse(self):
+        """Stop pooling if the server keeps closing idle connections"""
+        self._stale_reuses += 1
+        if self._stale_reuses >= 3 and self.keep_alive:
+            self.keep_alive = False
+            self.close()
+
+    def summary(self):
+        """Total requests, errors and mean latency in milliseconds"""
+        with self._lock:
+            calls = sum(entry['calls'] for entry in self.stats.values())
+            errors = sum(entry['errors'] for entry in self.stats.values())
+            seconds = sum(entry['seconds'] for entry in self.stats.values())
+        return calls, errors, (seconds / calls * 1000 if calls else 0.0)
+
+
+_client = None
+
+
+def get_client():
+    """Shared AnkiConnect client, recreated if ANKI_CONNECT_URL changed"""
+    global _client
+    if _client is None or _client.url != ANKI_CONNECT_URL:
+        if _client is not None:
+            _client.close()
+        _client = AnkiConnectClient(ANKI_CONNECT_URL)
+    return _client
+
+
+def post_to_anki_connect(body, content_length=None, action='request', timeout=None,
+                         retries=None, idempotent=True):
+    """POST a request body to AnkiConnect and return the unwrapped result
+
+    `body` is either bytes or a callable returning an iterable of byte
+    chunks; the latter needs `content_length` so the body can be streamed
+    without buffering it. Connection failures and timeouts are retried up
+    to `retries` times with exponential backoff; a request that isn't
+    `idempotent` is only retried if it never reached Anki.
+    """
+    retries = ANKI_CONNECT_RETRIES if retries is None else retries
+    delay = ANKI_CONNECT_BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            response_data = get_client().post(body, content_length, action, timeout)
+            break
+        except ConnectionError as e:
+            delivered = not isinstance(e.__cause__, ConnectionRefusedError)
+            if attempt == retries or (delivered and not idempotent):
+                raise Exception(f'Failed to connect to AnkiConnect. Make sure Anki is running with AnkiConnect installed. Error: {e}')
+            time.sleep(delay)
+            delay *= 2
+
+    if len(response_data) != 2:
+        raise Exception('Response has an unexpected number of fields')
+    if 'error' not in response_data:
+        raise Exception('Response is missing required error field')
+    if 'result' not in response_data:
+        raise Exception('Response is missing required result field')
+    if response_data['error'] is not None:
+        raise Exception(response_data['error'])
+
+    return response_data['result']
+
+
+def is_idempotent(action, params):
+    """Whether sending a request twice has the same effect as sending it once"""
+    if action == 'multi':
+        return all(is_idempotent(inner['action'], inner.get('params', {}))
+                   for inner in params.get('actions', []))
+    return action not in NON_IDEMPOTENT_ACTIONS
+
 
 def invoke_anki_connect(action, **params):
-    """Send a request to AnkiConnect API"""
+    """Send a request to AnkiConnect API
+
+    Uses the action's timeout from ANKI_CONNECT_TIMEOUTS and retries
+    failed connections (see `post_to_anki_connect`), except for the
+    'version' probe, which reports an unreachable Anki right away.
+    """
     request_json = json.dumps({
         'action': action,
         'version': 6,
         'params': params
     }).encode('utf-8')
 
-    try:
-        response = urllib.request.urlopen(
-            urllib.request.Request(ANKI_CONNECT_URL, request_json)
-        )
-        response_data = json.load(response)
+    return post_to_anki_connect(
+        request_json, action=action,
+        timeout=ANKI_CONNECT_TIMEOUTS.get(action, ANKI_CONNECT_TIMEOUT),
+        retries=0 if action == 'version' else ANKI_CONNECT_RETRIES,
+        idempotent=is_idempotent(action, params)
+    )
+
+
+def invoke_multi(actions):
+    """Send several actions in a single AnkiConnect `multi` request
+
+    `actions` is a list of (action, params) tuples. Returns a list of
+    (result, error) tuples in the same order, so one failing action does
+    not hide the results of the others.
+    """
+    get_client().count_multi_actions(action for action, _ in actions)
+    results = invoke_anki_connect('multi', actions=[
+        {'action': action, 'version': 6, 'params': params}
+        for action, params in actions
+    ])
+
+    replies = []
+    for reply in results:
+        if isinstance(reply, dict) and 'error' in reply:
+            replies.append((reply.get('result'), reply['error']))
+        else:
+            replies.append((reply, None))
+    return replies
+
+
+def chunked(items, size):
+    """Yield (start_index, chunk) pairs of at most `size` items"""
+    size = max(1, size)
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+class AdaptiveThrottle:
+    """Batch size and request pacing tuned to a target latency
+
+    AnkiConnect runs on Anki's main thread, so Anki's UI is frozen while a
+    request is being handled. After every request the measured latency is
+    compared with the target: above it the batch size is halved, and once
+    it is down to one note the pause between requests is doubled instead;
+    well below it the pause shrinks first and then the batch grows again a
+    step at a time (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, target_ms, max_batch=BATCH_SIZE):
+        self.target = target_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.batch_size = max(1, self.max_batch // 4)
+        self.step = max(1, self.max_batch // 10)
+        self.pause = 0.0
+        self.requests = 0
+        self.notes = 0
+        self.busy_seconds = 0.0
+        self.latencies = []
+        self._last_end = 0.0
+        self._lock = threading.Lock()
+
+    def chunks(self, items):
+        """Like `chunked`, but each chunk takes the batch size at that moment"""
+        start = 0
+        while start < len(items):
+            size = self.batch_size
+            yield start, items[start:start + size]
+            start += size
+
+    def run(self, fn, *args, items=None):
+        """Call `fn` once the current pause has passed and measure it
+
+        Only calls that sent `items` notes adjust the batch size; others
+        (media uploads) are just paced.
+        """
+        with self._lock:
+            remaining = self._last_end + self.pause - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._observe(time.perf_counter() - started, items)
+
+    def _observe(self, seconds, items):
+        with self._lock:
+            self._last_end = time.monotonic()
+            self.requests += 1
+            self.busy_seconds += seconds
+            self.latencies.append(seconds)
+            if not items:
+                return
+
+            self.notes += items
+            if seconds > self.target:
+                if self.batch_size > 1:
+                    self.batch_size = max(1, self.batch_size // 2)
+                else:
+                    self.pause = min(MAX_THROTTLE_PAUSE, max(0.05, self.pause * 2))
+            elif seconds < self.target * 0.7:
+                if self.pause > 0:
+                    self.pause = self.pause / 2 if self.pause > 0.05 else 0.0
+                else:
+                    self.batch_size = min(self.max_batch, self.batch_size + self.step)
+
+    def median_ms(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        return latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+
 
-        if len(response_data) != 2:
-            raise Exception('Response has an unexpected number of fields')
-        if 'error' not in response_data:
-            raise Exception('Response is missing required error field')
-        if 'result' not in response_data:
-            raise Exception('Response is missing required result field')
-        if response_data['error'] is not None:
-            raise Exception(response_data['error'])
+def throttled(throttle, fn, *args, items=None):
+    """Call fn(*args), paced and measured by `throttle` if there is one"""
+    if throttle is None:
+        return fn(*args)
+    return throttle.run(fn, *args, items=items)
 
-        return response_data['result']
-    except urllib.error.URLError as e:
-        raise Exception(f'Failed to connect to AnkiConnect. Make sure Anki is running with AnkiConnect installed. Error: {e}')
+
+def throttled_chunks(items, batch_size, throttle=None):
+    """`chunked`, sized by `throttle` when adaptive throttling is on"""
+    return throttle.chunks(items) if throttle else chunked(items, batch_size)
 
 
 def test_anki_connect():
@@ -86,50 +503,309 @@ def ensure_deck_exists(deck_name):
         return False
 
 
-def store_media_file(file_path, filename):
-    """Upload media file to Anki's media collection"""
-    try:
+def is_local_anki_connect(url=None):
+    """Check whether AnkiConnect runs on this machine"""
+    host = urlparse(url or ANKI_CONNECT_URL).hostname or ''
+    return host in ('localhost', '127.0.0.1', '::1')
+
+
+def select_media_transfer():
+    """Resolve MEDIA_TRANSFER to 'path' or 'stream'"""
+    if MEDIA_TRANSFER in ('path', 'stream'):
+        return MEDIA_TRANSFER
+    return 'path' if is_local_anki_connect() else 'stream'
+
+
+def stream_media_request(file_path, filename):
+    """Build a streamed `storeMediaFile` request body
+
+    Returns (chunks, content_length) where `chunks` is a generator function.
+    The file is base64-encoded one chunk at a time while the body is being
+    sent, so it is never held in memory as a whole.
+    """
+    prefix = (
+        '{"action": "storeMediaFile", "version": 6, "params": {"filename": '
+        + json.dumps(filename) + ', "data": "'
+    ).encode('utf-8')
+    suffix = b'"}}'
+
+    size = os.path.getsize(file_path)
+    encoded_size = 4 * ((size + 2) // 3)
+
+    def chunks():
+        yield prefix
         with open(file_path, 'rb') as f:
-            data = base64.b64encode(f.read()).decode('utf-8')
+            for chunk in iter(lambda: f.read(MEDIA_CHUNK_SIZE), b''):
+                yield base64.b64encode(chunk)
+        yield suffix
+
+    return chunks, len(prefix) + encoded_size + len(suffix)
+
 
-        invoke_anki_connect('storeMediaFile', filename=filename, data=data)
+def store_media_file(file_path, filename, transfer=None, warn=print):
+    """Upload media file to Anki's media collection
+
+    `transfer` is 'path' (AnkiConnect reads the file from disk) or 'stream'
+    (chunked base64 request body); it defaults to `select_media_transfer()`.
+    Failures are reported through `warn`.
+    """
+    transfer = transfer or select_media_transfer()
+    try:
+        if transfer == 'path':
+            invoke_anki_connect('storeMediaFile', filename=filename,
+                                path=os.path.abspath(file_path))
+        else:
+            body, content_length = stream_media_request(file_path, filename)
+            post_to_anki_connect(body, content_length, action='storeMediaFile')
         return filename
     except Exception as e:
-        print(f"  ⚠️  Warning: Could not upload media file {filename}: {e}")
+        warn(f"  ⚠️  Warning: Could not upload media file {filename}: {e}")
         return None
 
 
-def process_images(text, vault_path):
-    """Find and upload images, replace references with Anki format"""
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """SHA-1 of a file's bytes, read in chunks"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """Content-addressed record of the media stored in Anki
+
+    Files are stored as `<name>-<hash><ext>`, so identical bytes always map
+    to the same Anki file name and different files sharing a basename never
+    overwrite each other. A name already in Anki's media folder is never
+    uploaded again. Uploads run in worker threads, so their warnings go
+    through `warn` (e.g. `SyncReporter.warn`) rather than straight to the
+    console.
+    """
+
+    def __init__(self, stored_names=(), transfer=None, warn=print):
+        self.stored_names = set(stored_names)
+        self.transfer = transfer or select_media_transfer()
+        self.warn = warn
+        self._names_by_path = {}
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.reused = 0
+
+    @classmethod
+    def from_anki(cls, transfer=None, warn=print):
+        """Seed the cache with one `getMediaFilesNames` call"""
+        return cls(invoke_anki_connect('getMediaFilesNames', pattern='*'), transfer, warn)
+
+    def stored_name(self, file_path):
+        """Content-addressed Anki file name for a local media file"""
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        if key not in self._names_by_path:
+            stem, ext = os.path.splitext(os.path.basename(file_path))
+            digest = file_content_hash(file_path)[:MEDIA_HASH_LENGTH]
+            self._names_by_path[key] = f"{stem}-{digest}{ext}"
+        return self._names_by_path[key]
+
+    def remember(self, file_path, signature, filename):
+        """Record a name computed elsewhere (e.g. in a parser process)"""
+        if signature:
+            self._names_by_path[(file_path, signature[0], signature[1])] = filename
+
+    def store(self, file_path):
+        """Upload a file unless identical bytes are already in Anki
+
+        Returns the Anki file name, or None if the file could not be read
+        (e.g. deleted or locked during the sync) or the upload failed.
+        """
+        try:
+            filename = self.stored_name(file_path)
+            size = os.path.getsize(file_path)
+        except OSError as e:
+            self.warn(f"  ⚠️  Warning: Could not read media file {file_path}: {e}")
+            return None
+        with self._lock:
+            if filename in self.stored_names:
+                self.reused += 1
+                return filename
+
+        transfer = self.transfer
+        stored = store_media_file(file_path, filename, transfer, self.warn)
+        if stored is None and transfer == 'path':
+            # Anki may not see our filesystem (e.g. a container or VM)
+            if self.transfer == 'path':
+                self.warn("  ⚠️  Path transfer failed, switching to streamed uploads")
+                self.transfer = 'stream'
+            stored = store_media_file(file_path, filename, 'stream', self.warn)
+        if stored is None:
+            return None
+
+        with self._lock:
+            self.stored_names.add(filename)
+            self.uploaded += 1
+            self.uploaded_bytes += size
+        return filename
+
+
+class VaultFileIndex:
+    """Basename -> path index of every attachment in the vault
+
+    Built lazily with one recursive `os.scandir` walk the first time an
+    image is looked up, then shared by every card, so resolving a reference
+    never touches the disk. Markdown files and hidden folders are left out.
+    """
+
+    def __init__(self, vault_path):
+        self.vault_path = os.path.abspath(vault_path)
+        self._by_name = None
+        self._paths = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks can't be pickled; worker processes get their own
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def build(self):
+        """Walk the vault now (normally done on first lookup)"""
+        with self._lock:
+            if self._by_name is not None:
+                return
+            by_name = {}
+            paths = set()
+            pending = [self.vault_path]
+            while pending:
+                try:
+                    with os.scandir(pending.pop()) as entries:
+                        for entry in entries:
+                            if entry.name.startswith('.'):
+                                continue
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append(entry.path)
+                            elif not entry.name.endswith('.md'):
+                                relative = os.path.relpath(entry.path, self.vault_path).replace(os.sep, '/')
+                                paths.add(relative)
+                                by_name.setdefault(entry.name.lower(), []).append(relative)
+                except OSError:
+                    continue
+            self._paths = paths
+            self._by_name = by_name
+
+    def __len__(self):
+        self.build()
+        return len(self._paths)
+
+    def resolve(self, link, source_path=None):
+        """Full path for an image link, following Obsidian's rules
+
+        An exact vault-relative (or note-relative) path wins. Otherwise the
+        link is matched by file name: a file next to the note first, then
+        the one with the shortest path. Returns None when nothing matches.
+        """
+        self.build()
+        link = link.replace('\\', '/').lstrip('/')
+        source_dir = ''
+        if source_path:
+            source_dir = os.path.dirname(
+                os.path.relpath(source_path, self.vault_path)
+            ).replace(os.sep, '/')
+
+        candidates = [link]
+        if source_dir:
+            candidates.insert(0, os.path.normpath(f"{source_dir}/{link}").replace(os.sep, '/'))
+        for candidate in candidates:
+            if candidate in self._paths:
+                return os.path.join(self.vault_path, candidate)
+
+        matches = self._by_name.get(link.rsplit('/', 1)[-1].lower(), [])
+        if '/' in link:
+            # Partial paths like "diagrams/flow.png" must match the tail
+            matches = [path for path in matches if path.lower().endswith('/' + link.lower())]
+        if not matches:
+            return None
+
+        best = min(matches, key=lambda path: (
+            os.path.dirname(path) != source_dir,
+            path.count('/'),
+            path
+        ))
+        return os.path.join(self.vault_path, best)
+
+
+_vault_indexes = {}
+
+
+def get_vault_index(vault_path):
+    """The shared `VaultFileIndex` for a vault"""
+    key = os.path.abspath(vault_path)
+    if key not in _vault_indexes:
+        _vault_indexes[key] = VaultFileIndex(key)
+    return _vault_indexes[key]
+
+
+def reset_vault_index(vault_path, index=None):
+    """Start a fresh (or install a prebuilt) index, e.g. once per sync run"""
+    index = index or VaultFileIndex(vault_path)
+    _vault_indexes[os.path.abspath(vault_path)] = index
+    return index
+
+
+def process_images(text, vault_path, media_cache=None, warn=print, source_path=None,
+                   missing=None):
+    """Find and upload images, replace references with Anki format
+
+    With a `MediaCache` references are rewritten to the content-addressed
+    names and uploading is left to the caller (`MediaCache.store`); without
+    one every reference is uploaded under its own basename right away.
+    Relative references are looked up in the shared vault index, so images
+    in any subfolder are found by name like Obsidian does.
+    Returns the processed text and the full paths of the images it found;
+    references that could not be resolved or read are appended to
+    `missing` if a list is given.
+    """
     images_found = []
+    index = get_vault_index(vault_path)
 
     def replace_image(match):
         # Extract image path from either format
         if match.lastindex == 2:
-            # Standard markdown: ![alt](path)
-            image_path = match.group(2)
+            # Standard markdown: ![alt](path), possibly URL-encoded
+            image_path = unquote(match.group(2).strip())
         else:
-            # Obsidian wiki-style: ![[path]]
-            image_path = match.group(1)
+            # Obsidian wiki-style: ![[path]] or ![[path|300]]
+            image_path = match.group(1).split('|', 1)[0].strip()
 
         # Handle both relative and absolute paths
-        if not os.path.isabs(image_path):
-            # Try media folder first
-            full_path = os.path.join(vault_path, MEDIA_FOLDER, image_path)
-            if not os.path.exists(full_path):
-                # Try relative to vault root
-                full_path = os.path.join(vault_path, image_path)
+        if os.path.isabs(image_path):
+            full_path = image_path if os.path.exists(image_path) else None
         else:
-            full_path = image_path
-
-        if os.path.exists(full_path):
-            filename = os.path.basename(full_path)
-            stored_filename = store_media_file(full_path, filename)
+            full_path = index.resolve(image_path, source_path)
+
+        if full_path:
+            if media_cache is not None:
+                try:
+                    stored_filename = media_cache.stored_name(full_path)
+                except OSError as e:
+                    warn(f"  ⚠️  Warning: Could not read image {image_path}: {e}")
+                    if missing is not None:
+                        missing.append(image_path)
+                    return match.group(0)
+            else:
+                stored_filename = store_media_file(full_path, os.path.basename(full_path),
+                                                   warn=warn)
             if stored_filename:
-                images_found.append(filename)
+                images_found.append(full_path)
                 return f'<img src="{stored_filename}">'
 
-        print(f"  ⚠️  Warning: Image not found: {image_path}")
+        warn(f"  ⚠️  Warning: Image not found: {image_path}")
+        if missing is not None:
+            missing.append(image_path)
         return match.group(0)  # Keep original if not found
 
     # Pattern for Obsidian wiki-style images: ![[image.png]]
@@ -147,71 +823,110 @@ def process_images(text, vault_path):
     return processed_text, images_found
 
 
-def clean_markdown(text, vault_path=None):
-    """Convert markdown formatting to HTML for Anki"""
-    # Remove YAML frontmatter
-    text = re.sub(r'^---\s*\n.*?\n---\s*\n', '', text, flags=re.DOTALL)
-
-    # Process images first (before other conversions)
-    images = []
-    if vault_path:
-        text, images = process_images(text, vault_path)
-
-    # Convert markdown headers to bold
-    text = re.sub(r'^#{1,6}\s+(.+)$', r'<b>\1</b>', text, flags=re.MULTILINE)
-
-    # Convert **bold** to <b>bold</b>
-    text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
-
-    # Convert *italic* to <i>italic</i> (but not if part of list marker)
-    text = re.sub(r'(?<!\*)\*([^*]+?)\*(?!\*)', r'<i>\1</i>', text)
+# Precompiled patterns for the markdown renderer
+FRONTMATTER_PATTERN = re.compile(r'^---\s*\n.*?\n---\s*\n', re.DOTALL)
+HEADER_PATTERN = re.compile(r'#{1,6}\s+(.+)')
+LIST_ITEM_PATTERN = re.compile(r'\s*[-*]\s+')
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+# Every inline construct in one alternation, so the text is scanned once.
+# Each alternative starts with a literal character (lookbehinds come after
+# it) so the regex engine can skip plain text quickly, and none crosses a
+# line break. Earlier alternatives win at the same position: code spans and
+# existing HTML (e.g. <img> from process_images) are emitted untouched
+INLINE_PATTERN = re.compile(r"""
+    `(?P<code>[^`\n]+?)`
+  | (?P<html><[A-Za-z/!][^<>\n]*>)
+  | \*\*(?P<bold>.+?)\*\*
+  | \[\[(?P<wikilink>[^\]\n]+?)\]\]
+  | \[(?P<link_text>[^\]\n]+?)\]\((?P<link_url>[^)\n]+?)\)
+  | \*(?<!\*\*)(?P<italic>[^*\s][^*\n]*?)\*(?!\*)
+  | _(?<![A-Za-z0-9_]_)(?P<underscore>[^_\n]+?)_(?![A-Za-z0-9_])
+  | (?P<tag>\#(?<![&\w]\#)[A-Za-z0-9_-]+)
+""", re.VERBOSE)
+
+INLINE_START_PATTERN = re.compile(r'[`<*\[_#]')
+
+_INLINE_RENDERERS = {
+    'code': lambda m: f'<code>{m.group("code")}</code>',
+    'html': lambda m: m.group('html'),
+    'bold': lambda m: f'<b>{render_inline(m.group("bold"))}</b>',
+    'wikilink': lambda m: render_inline(m.group('wikilink')),
+    'link_url': lambda m: f'<a href="{m.group("link_url")}">{render_inline(m.group("link_text"))}</a>',
+    'italic': lambda m: f'<i>{render_inline(m.group("italic"))}</i>',
+    'underscore': lambda m: f'<i>{render_inline(m.group("underscore"))}</i>',
+    'tag': lambda m: '',
+}
+
+
+def render_inline(text):
+    """Render bold/italic/code/links and strip #tags in a single scan"""
+    if not INLINE_START_PATTERN.search(text):
+        return text  # Common for the inside of bold/italic spans
+    return INLINE_PATTERN.sub(lambda m: _INLINE_RENDERERS[m.lastgroup](m), text)
+
+
+def render_markdown(text):
+    """Single-pass markdown to Anki HTML renderer
+
+    Produces the same HTML as the original chain of substitutions for
+    headers, bold/italic, code, lists, wikilinks, links, tag stripping and
+    <br> line breaks, with these deliberate differences:
+    - code spans are left alone (no italics inside `snake_case`, no tag
+      stripping of `#include`)
+    - `_italic_` needs word boundaries, so snake_case words stay intact
+    - `*italic*` never spans lines or starts with a space, so `* item`
+      lists render as lists
+    - #tags are only stripped when not glued to a word or an HTML entity,
+      so `C#`, `&#39;` and `url#fragment` survive
+    """
+    lines = []
+    in_list = False
 
-    # Convert _italic_ to <i>italic</i>
-    text = re.sub(r'_(.+?)_', r'<i>\1</i>', text)
+    for line in render_inline(text).split('\n'):
+        # Cheap first-character check before trying the line patterns
+        if line[:1] in ('-', '*', ' ', '\t'):
+            item = LIST_ITEM_PATTERN.match(line)
+            if item:
+                if not in_list:
+                    lines.append('<ul>')
+                    in_list = True
+                lines.append(f'<li>{line[item.end():]}</li>')
+                continue
 
-    # Convert `code` to <code>code</code>
-    text = re.sub(r'`(.+?)`', r'<code>\1</code>', text)
+        if in_list:
+            lines.append('</ul>')
+            in_list = False
 
-    # Convert bullet points to HTML lists
-    lines = text.split('\n')
-    in_list = False
-    result_lines = []
-
-    for line in lines:
-        if re.match(r'^\s*[-*]\s+', line):
-            if not in_list:
-                result_lines.append('<ul>')
-                in_list = True
-            item = re.sub(r'^\s*[-*]\s+', '', line)
-            result_lines.append(f'<li>{item}</li>')
-        else:
-            if in_list:
-                result_lines.append('</ul>')
-                in_list = False
-            result_lines.append(line)
+        header = HEADER_PATTERN.match(line) if line[:1] == '#' else None
+        lines.append(f'<b>{header.group(1)}</b>' if header else line)
 
     if in_list:
-        result_lines.append('</ul>')
+        lines.append('</ul>')
 
-    text = '\n'.join(result_lines)
+    text = BLANK_LINES_PATTERN.sub('\n\n', '\n'.join(lines)).strip()
 
-    # Convert links [[Link]] to just Link
-    text = re.sub(r'\[\[(.+?)\]\]', r'\1', text)
+    # Convert newlines to <br> for Anki
+    return text.replace('\n', '<br>')
 
-    # Convert [text](url) to <a href="url">text</a>
-    text = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', text)
 
-    # Remove tags
-    text = re.sub(r'#[a-zA-Z0-9_-]+', '', text)
+def clean_markdown(text, vault_path=None, media_cache=None, warn=print, source_path=None,
+                   missing=None):
+    """Convert markdown formatting to HTML for Anki
 
-    # Clean up extra whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = text.strip()
+    `source_path` is the note being rendered, used to resolve images
+    relative to it. Unresolved image references go to `missing` (see
+    `process_images`).
+    """
+    # Remove YAML frontmatter
+    text = FRONTMATTER_PATTERN.sub('', text)
 
-    # Convert newlines to <br> for Anki
-    text = text.replace('\n', '<br>')
+    # Process images first (before other conversions)
+    images = []
+    if vault_path:
+        text, images = process_images(text, vault_path, media_cache, warn, source_path, missing)
 
-    return text, images
+    return render_markdown(text), images
 
 
 def extract_note_id(content, file_path):
@@ -233,144 +948,1251 @@ def extract_note_id(content, file_path):
     return note_id
 
 
-def parse_card_from_template(file_path, vault_path):
-    """Parse Front:/Back: template structure from markdown file"""
+# A `Front:` or `Back:` line; a Front line may end with an Obsidian block
+# anchor (`Front: ^capital-cities`) that pins the card's ID
+CARD_MARKER_PATTERN = re.compile(r'^(Front|Back):[ \t]*(?:\^([A-Za-z0-9-]+))?[ \t]*\n', re.MULTILINE)
+
+
+def block_note_id(note_id, anchor, position):
+    """ID of the card block at `position` in a file whose ID is `note_id`
+
+    The first block keeps the file's ID, so single-card files sync exactly
+    as before. An anchor gives a block an ID that survives reordering;
+    otherwise later blocks are numbered by position (`rebind_note_ids`
+    keeps them on their notes once the file has been synced).
+    """
+    if anchor:
+        return f"{note_id}-{anchor}"
+    return note_id if position == 0 else f"{note_id}-{position + 1}"
+
+
+def parse_cards_from_template(file_path, vault_path, media_cache=None, warn=print,
+                              timings=None):
+    """Parse every Front:/Back: block of a markdown file
+
+    A block's Back runs until the next `Front:` line or the end of the file.
+    Returns the file's note ID and a list of (front_html, back_html, images,
+    note_id, anchored, missing) tuples, one per block with both sides filled
+    in, where `missing` lists the image references that could not be
+    resolved. Warnings go through `warn` so
+    parallel callers can collect them. Seconds spent reading the file and
+    rendering markdown are added to `timings['read']` and
+    `timings['render']` if a dict is given. Raises OSError or
+    UnicodeDecodeError if the file can't be read as UTF-8, so an unreadable
+    file is never mistaken for one without cards.
+    """
+    started = time.perf_counter()
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
-    except Exception as e:
-        print(f"  ❌ Error reading {file_path}: {e}")
-        return None, None, [], None
+    finally:
+        if timings is not None:
+            timings['read'] = timings.get('read', 0.0) + time.perf_counter() - started
+    started = time.perf_counter()
 
     # Extract unique ID for this note
     note_id = extract_note_id(content, file_path)
 
     # Remove YAML frontmatter for processing
-    content_no_yaml = re.sub(r'^---\s*\n.*?\n---\s*\n', '', content, flags=re.DOTALL)
+    content_no_yaml = FRONTMATTER_PATTERN.sub('', content, count=1)
 
-    # Try to parse Front:/Back: format
-    front_match = re.search(r'^Front:\s*\n(.*?)(?=^Back:|\Z)', content_no_yaml, re.MULTILINE | re.DOTALL)
-    back_match = re.search(r'^Back:\s*\n(.*?)$', content_no_yaml, re.MULTILINE | re.DOTALL)
+    markers = list(CARD_MARKER_PATTERN.finditer(content_no_yaml))
+    fronts = [i for i, marker in enumerate(markers) if marker.group(1) == 'Front']
 
-    if front_match and back_match:
-        front = front_match.group(1).strip()
-        back = back_match.group(1).strip()
+    cards = []
+    for position, i in enumerate(fronts):
+        end = markers[fronts[position + 1]].start() if position + 1 < len(fronts) else len(content_no_yaml)
+        if i + 1 >= len(markers) or markers[i + 1].group(1) != 'Back':
+            continue
+
+        front_marker, back_marker = markers[i], markers[i + 1]
+        front = content_no_yaml[front_marker.end():back_marker.start()].strip()
+        back = content_no_yaml[back_marker.end():end].strip()
 
         # If either is empty, skip
         if not front or not back:
-            return None, None, [], None
+            if len(fronts) > 1:
+                warn(f"  ⚠️  Warning: Card {position + 1} has an empty Front or Back, skipped")
+            continue
 
         # Clean and convert markdown to HTML
-        front_html, front_images = clean_markdown(front, vault_path)
-        back_html, back_images = clean_markdown(back, vault_path)
+        missing = []
+        front_html, front_images = clean_markdown(front, vault_path, media_cache, warn, file_path,
+                                                  missing)
+        back_html, back_images = clean_markdown(back, vault_path, media_cache, warn, file_path,
+                                                missing)
+
+        anchor = front_marker.group(2)
+        cards.append((front_html, back_html, front_images + back_images,
+                      block_note_id(note_id, anchor, position), bool(anchor), missing))
+
+    if timings is not None:
+        timings['render'] = timings.get('render', 0.0) + time.perf_counter() - started
+    return note_id, cards
+
+
+def fetch_existing_notes(batch_size=BATCH_SIZE, throttle=None):
+    """Map our note IDs to the Anki notes that already carry them
+
+    Runs one `findNotes` for every tracked note plus chunked `notesInfo`
+    calls, so create/update decisions become local dictionary lookups.
+    Keys are lowercased IDs because Anki matches tags case-insensitively.
+    """
+    anki_note_ids = invoke_anki_connect('findNotes', query=f'"tag:{ID_TAG_PREFIX}*"')
+
+    existing = {}
+    for _, chunk in throttled_chunks(anki_note_ids, batch_size, throttle):
+        infos = throttled(throttle, lambda: invoke_anki_connect('notesInfo', notes=chunk),
+                          items=len(chunk))
+        for info in infos:
+            if not info or 'noteId' not in info:
+                continue
+
+            fields = {
+                name: field.get('value', '')
+                for name, field in info.get('fields', {}).items()
+            }
+            for tag in info.get('tags', []):
+                if tag.lower().startswith(ID_TAG_PREFIX):
+                    note_id = tag[len(ID_TAG_PREFIX):].lower()
+                    # Keep the first note if an ID was duplicated in Anki
+                    existing.setdefault(note_id, {
+                        'anki_id': info['noteId'],
+                        'fields': fields,
+                        'tags': info.get('tags', [])
+                    })
+
+    return existing
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """Load the sync manifest, keyed by note ID
+
+    A missing or unreadable manifest simply means every file gets synced.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Warning: Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
 
-        all_images = front_images + back_images
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('notes', {})
 
-        return front_html, back_html, all_images, note_id
-    else:
-        # No template found
-        return None, None, [], None
 
+def save_manifest(notes, manifest_path=MANIFEST_PATH):
+    """Atomically write the sync manifest next to the script
 
-def find_note_by_id(note_id):
-    """Find an Anki note by our custom ID stored in tags"""
-    # Search for notes with our ID tag
-    query = f'"tag:obsidian-id-{note_id}"'
+    The checkpoint journal is folded into the manifest by then, so it is
+    removed once the manifest is safely on disk.
+    """
+    directory = os.path.dirname(manifest_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.anki-manifest-', suffix='.json', dir=directory)
     try:
-        note_ids = invoke_anki_connect('findNotes', query=query)
-        if note_ids and len(note_ids) > 0:
-            return note_ids[0]  # Return first match
-        return None
-    except Exception as e:
-        print(f"  ⚠️  Warning: Could not search for note: {e}")
-        return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'notes': notes}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
+    journal_path = checkpoint_path(manifest_path)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
 
-def update_note_in_anki(anki_note_id, front, back, tags=None):
-    """Update an existing note in Anki"""
-    if tags is None:
-        tags = []
 
-    note = {
-        "id": anki_note_id,
-        "fields": {
-            "Front": front,
-            "Back": back
-        },
-        "tags": tags
-    }
+def checkpoint_path(manifest_path=MANIFEST_PATH):
+    """Checkpoint journal kept next to the manifest during a sync"""
+    return os.path.splitext(manifest_path)[0] + '.journal'
 
+
+def read_checkpoint(journal_path):
+    """Manifest entries confirmed by an interrupted sync, keyed by note ID
+
+    A half-written last line (the process died mid-write) is ignored.
+    """
+    entries = {}
     try:
-        invoke_anki_connect('updateNoteFields', note=note)
-        # Also update tags
-        invoke_anki_connect('clearUnusedTags')
-        return True
-    except Exception as e:
-        print(f"  ⚠️  Warning: Could not update note: {e}")
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.update(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return entries
+
+
+class SyncCheckpoint:
+    """Append-only journal of the cards Anki has confirmed during a sync
+
+    Each finished batch appends the manifest entries of its created,
+    updated and unchanged cards as one JSON line. If Anki or the script
+    dies halfway, the next run merges the journal into the manifest and
+    skips those cards instead of starting over. The journal is flushed
+    after every batch and fsynced at most every CHECKPOINT_INTERVAL seconds.
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.written = 0
+        self._file = None
+        self._last_sync = time.monotonic()
+
+    def write(self, entries):
+        """Append a batch of confirmed {note_id: entry} manifest entries"""
+        if not entries:
+            return
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entries, sort_keys=True) + '\n')
+        self._file.flush()
+        self.written += len(entries)
+        if time.monotonic() - self._last_sync >= CHECKPOINT_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def file_signature(path):
+    """Cheap change detector for a file: (mtime in ns, size)"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def media_signatures(images):
+    """Map each referenced media path to its current file signature"""
+    signatures = {}
+    for image in images:
+        try:
+            signatures[image] = file_signature(image)
+        except OSError:
+            signatures[image] = None
+    return signatures
+
+
+def card_hash(front, back, media):
+    """Content hash of a rendered card and the media it references"""
+    digest = hashlib.sha1()
+    digest.update(front.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(back.encode('utf-8'))
+    for image, signature in sorted(media.items()):
+        digest.update(f"\0{image}:{signature}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def is_entry_current(entry, signature, existing_notes, note_id):
+    """Check a manifest entry against the file on disk and the note in Anki"""
+    if entry.get('mtime') != signature[0] or entry.get('size') != signature[1]:
         return False
 
+    # Media edited in place does not touch the markdown file
+    media = entry.get('media', {})
+    if media_signatures(media) != media:
+        return False
 
-def add_note_to_anki(front, back, deck_name, note_id, tags=None):
-    """Add a single note to Anki via AnkiConnect"""
-    if tags is None:
-        tags = []
-
-    # Add our unique ID as a tag for tracking
-    id_tag = f"obsidian-id-{note_id}"
-    if id_tag not in tags:
-        tags.append(id_tag)
-
-    note = {
-        "deckName": deck_name,
-        "modelName": "Basic",
-        "fields": {
-            "Front": front,
-            "Back": back
-        },
-        "tags": tags,
-        "options": {
-            "allowDuplicate": True  # We handle duplicates ourselves
-        }
-    }
+    # Images that were missing may have been added since; render again
+    if entry.get('missing'):
+        return False
 
-    try:
-        result = invoke_anki_connect('addNote', note=note)
-        return result  # Returns note ID if successful
-    except Exception as e:
-        raise e
+    # The note may have been deleted in Anki since the last sync
+    note = existing_notes.get(note_id.lower())
+    return bool(note) and note['anki_id'] == entry.get('anki_id')
 
 
-def sync_or_update_note(front, back, deck_name, note_id, tags=None):
-    """Check if note exists and update it, or create new one"""
-    if tags is None:
-        tags = ['obsidian']
+def card_tags(note_id):
+    """Tags attached to every synced card, including our tracking ID tag"""
+    return ['obsidian', f"{ID_TAG_PREFIX}{note_id}"]
 
-    # Add our unique ID as a tag
-    id_tag = f"obsidian-id-{note_id}"
-    if id_tag not in tags:
-        tags.append(id_tag)
 
-    # Check if note already exists
-    existing_note_id = find_note_by_id(note_id)
+def diff_note(note, front, back, note_id):
+    """What has to change for an existing note to match a rendered card
 
-    if existing_note_id:
-        # Update existing note
-        if update_note_in_anki(existing_note_id, front, back, tags):
-            return 'updated', existing_note_id
+    Returns (changed_fields, missing_tags); both empty means the note in
+    Anki is already identical. Tags are compared case-insensitively, like
+    Anki does, and tags added in Anki by hand are left alone.
+    """
+    current = note.get('fields', {})
+    changed_fields = {
+        name: value
+        for name, value in (('Front', front), ('Back', back))
+        if current.get(name) != value
+    }
+    current_tags = {tag.lower() for tag in note.get('tags', [])}
+    missing_tags = [tag for tag in card_tags(note_id) if tag.lower() not in current_tags]
+    return changed_fields, missing_tags
+
+
+def sync_cards_batched(cards, deck_name, existing_notes, batch_size=BATCH_SIZE, throttle=None):
+    """Create or update cards in chunked AnkiConnect `multi` requests
+
+    `cards` is a list of (front, back, note_id) tuples and `existing_notes`
+    the map returned by `fetch_existing_notes`. Existing notes are compared
+    field by field: only changed fields and missing tags are sent, and notes
+    that already match are left untouched. Returns a list of (status,
+    result) tuples in the same order, where status is 'created', 'updated',
+    'unchanged' or 'error'. `existing_notes` is updated in place so later
+    batches in a long-running process see the new state. With a `throttle`
+    the chunk size and pacing follow `AdaptiveThrottle` instead.
+    """
+    results = [None] * len(cards)
+    updates = []
+    creates = []
+
+    for i, (front, back, note_id) in enumerate(cards):
+        note = existing_notes.get(note_id.lower())
+        if not note:
+            creates.append(i)
+            continue
+
+        changed_fields, missing_tags = diff_note(note, front, back, note_id)
+        if changed_fields or missing_tags:
+            updates.append((i, changed_fields, missing_tags))
         else:
-            return 'error', None
+            results[i] = ('unchanged', note['anki_id'])
+
+    # Update existing notes, sending only what differs
+    for _, chunk in throttled_chunks(updates, batch_size, throttle):
+        actions = []
+        owners = []
+        for i, changed_fields, missing_tags in chunk:
+            anki_id = existing_notes[cards[i][2].lower()]['anki_id']
+            if changed_fields:
+                actions.append(('updateNoteFields', {'note': {"id": anki_id, "fields": changed_fields}}))
+                owners.append(i)
+            if missing_tags:
+                actions.append(('addTags', {'notes': [anki_id], 'tags': ' '.join(missing_tags)}))
+                owners.append(i)
+
+        try:
+            replies = throttled(throttle, invoke_multi, actions, items=len(chunk))
+        except Exception as e:
+            for i, _, _ in chunk:
+                results[i] = ('error', str(e))
+            continue
+
+        errors = {}
+        for i, (_, error) in zip(owners, replies):
+            if error and i not in errors:
+                errors[i] = error
+
+        for i, changed_fields, missing_tags in chunk:
+            note = existing_notes[cards[i][2].lower()]
+            if i in errors:
+                results[i] = ('error', errors[i])
+                continue
+            note['fields'].update(changed_fields)
+            note['tags'] = note['tags'] + missing_tags
+            results[i] = ('updated', note['anki_id'])
+
+    # Create new notes
+    for _, chunk in throttled_chunks(creates, batch_size, throttle):
+        actions = []
+        for i in chunk:
+            front, back, note_id = cards[i]
+            actions.append(('addNote', {'note': {
+                "deckName": deck_name,
+                "modelName": "Basic",
+                "fields": {"Front": front, "Back": back},
+                "tags": card_tags(note_id),
+                "options": {"allowDuplicate": True}
+            }}))
+
+        try:
+            replies = throttled(throttle, invoke_multi, actions, items=len(chunk))
+        except Exception as e:
+            for i in chunk:
+                results[i] = ('error', str(e))
+            continue
+
+        for i, (new_note_id, error) in zip(chunk, replies):
+            if error or not new_note_id:
+                results[i] = ('error', error or 'AnkiConnect returned no note ID')
+                continue
+
+            front, back, note_id = cards[i]
+            existing_notes[note_id.lower()] = {
+                'anki_id': new_note_id,
+                'fields': {'Front': front, 'Back': back},
+                'tags': card_tags(note_id)
+            }
+            results[i] = ('created', new_note_id)
+
+    return results
+
+
+def find_orphaned_notes(existing_notes, live_ids):
+    """Tracked Anki notes whose ID no longer belongs to any card file
+
+    Returns a sorted list of (note_id, anki_id) tuples.
+    """
+    live = {note_id.lower() for note_id in live_ids}
+    return sorted(
+        (note_id, note['anki_id'])
+        for note_id, note in existing_notes.items()
+        if note_id not in live
+    )
+
+
+def delete_orphaned_notes(orphans, batch_size=BATCH_SIZE, warn=print):
+    """Delete (note_id, anki_id) pairs in chunked `deleteNotes` calls
+
+    Returns the number of notes deleted; failed chunks are reported
+    through `warn`.
+    """
+    deleted = 0
+    for _, chunk in chunked(orphans, batch_size):
+        try:
+            invoke_anki_connect('deleteNotes', notes=[anki_id for _, anki_id in chunk])
+            deleted += len(chunk)
+        except Exception as e:
+            warn(f"   ❌ Could not delete orphaned notes: {e}")
+    return deleted
+
+
+def run_maintenance(existing_notes, live_ids, prune=False, dry_run=False,
+                    batch_size=BATCH_SIZE, warn=print):
+    """End-of-run collection maintenance
+
+    Runs a single `clearUnusedTags` for the whole sync (instead of one per
+    updated note) and reports notes orphaned by deleted card files. With
+    `prune` they are deleted in chunked `deleteNotes` calls; with `dry_run`
+    they are only listed. Deletion errors go to `warn`. Returns the number
+    of orphans deleted.
+    """
+    orphans = find_orphaned_notes(existing_notes, live_ids)
+    deleted = 0
+
+    print("-"*60)
+    print("🧹 Maintenance")
+
+    if orphans and prune and not live_ids:
+        # An empty or unreadable anki/ folder must never wipe the deck
+        print(f"   ⚠️  Refusing to delete all {len(orphans)} tracked notes: no card files were found")
+    elif orphans and prune and dry_run:
+        print(f"   🔍 [DRY RUN] Would delete {len(orphans)} orphaned notes:")
+        for note_id, anki_id in orphans:
+            print(f"      • {note_id} (Anki ID: {anki_id})")
+    elif orphans and prune:
+        deleted = delete_orphaned_notes(orphans, batch_size, warn)
+        print(f"   🗑️  Deleted {deleted} orphaned notes")
+    elif orphans:
+        print(f"   ℹ️  {len(orphans)} notes in Anki no longer have a card file (use --prune to delete them)")
+
+    if dry_run:
+        print("   🔍 [DRY RUN] Would clear unused tags")
+    else:
+        try:
+            invoke_anki_connect('clearUnusedTags')
+            print("   🏷️  Cleared unused tags")
+        except Exception as e:
+            print(f"   ⚠️  Warning: Could not clear unused tags: {e}")
+
+    return deleted
+
+
+def scan_card_file(file_path, vault_path, manifest, entries_by_path, existing_notes,
+                   media_cache, full=False):
+    """Decide what a card file needs, reading and rendering it if changed
+
+    Safe to run in worker threads: it only reads the shared state and
+    collects its console output in the returned record instead of printing.
+    The record's 'state' is one of 'up_to_date', 'card', 'skipped' or 'error'.
+    A 'card' record lists the blocks that need syncing in 'cards' and the
+    manifest entries of its unchanged blocks in 'entries'. An 'error' record
+    for a file that could not be read or decoded carries its manifest
+    entries from the last sync in 'previous', so its notes stay tracked.
+    """
+    file = os.path.basename(file_path)
+    relative_path = os.path.relpath(file_path, vault_path).replace(os.sep, '/')
+    record = {'file': file, 'path': relative_path, 'messages': [], 'timings': {}}
+    known_ids = entries_by_path.get(relative_path, [])
+
+    def keep_previous(error):
+        record.update(state='error', error=error,
+                      previous={note_id: manifest[note_id] for note_id in known_ids})
+        return record
+
+    try:
+        signature = file_signature(file_path)
+    except OSError as e:
+        return keep_previous(f"Error reading {file}: {e}")
+
+    # Skip unchanged files before reading them
+    if not full and known_ids and all(
+        is_entry_current(manifest[note_id], signature, existing_notes, note_id)
+        for note_id in known_ids
+    ):
+        record.update(state='up_to_date', entries={note_id: manifest[note_id] for note_id in known_ids})
+        return record
+
+    try:
+        file_id, cards = parse_cards_from_template(
+            file_path, vault_path, media_cache, warn=record['messages'].append,
+            timings=record['timings']
+        )
+    except (OSError, UnicodeDecodeError) as e:
+        return keep_previous(f"Error reading {file}: {e}")
+
+    if not cards:
+        record.update(state='skipped', reason="no Front:/Back: template found")
+        return record
+
+    cards = [(front, back, images, note_id, anchored, missing, media_signatures(images))
+             for front, back, images, note_id, anchored, missing in cards]
+    hashes = [card_hash(front, back, media) for front, back, _, _, _, _, media in cards]
+    note_ids = rebind_note_ids(
+        file_id, [(note_id, anchored, digest)
+                  for (_, _, _, note_id, anchored, _, _), digest in zip(cards, hashes)],
+        manifest, known_ids, existing_notes
+    )
+
+    entries = {}
+    changed = []
+    for block, ((front, back, images, _, _, missing, media), digest, note_id) in enumerate(
+            zip(cards, hashes, note_ids)):
+        entry = {
+            'path': relative_path,
+            'mtime': signature[0],
+            'size': signature[1],
+            'media': media,
+            'hash': digest,
+            'block': block
+        }
+        if missing:
+            entry['missing'] = missing
+
+        # Touched but not modified: only refresh the file signature
+        previous = manifest.get(note_id)
+        note = existing_notes.get(note_id.lower())
+        if (not full and previous and note
+                and previous.get('hash') == entry['hash']
+                and previous.get('anki_id') == note['anki_id']):
+            entry['anki_id'] = previous['anki_id']
+            entries[note_id] = entry
+            continue
+
+        stored_names = {}
+        for image in images:
+            if media.get(image):
+                try:
+                    stored_names[image] = media_cache.stored_name(image)
+                except OSError:
+                    # Gone since it was rendered; MediaCache.store warns on upload
+                    pass
+
+        changed.append({'front': front, 'back': back, 'images': images,
+                        'note_id': note_id, 'entry': entry, 'stored_names': stored_names})
+
+    if not changed:
+        record.update(state='up_to_date', entries=entries)
     else:
-        # Create new note
+        record.update(state='card', cards=changed, entries=entries)
+    return record
+
+
+def rebind_note_ids(file_id, blocks, manifest, known_ids, existing_notes):
+    """Note ids for the blocks of a file that keep every card on its own note
+
+    `blocks` lists the (note_id, anchored, card_hash) of the file's blocks
+    in order and `known_ids` the note ids the file had at the last sync.
+    Blocks without an anchor are numbered by position, so adding or
+    removing a block shifts every later one onto a note (and review
+    history) that belongs to another card. Instead, such a block goes back
+    to the note that held its content at the last sync; edited blocks take
+    the notes whose content is gone, in their old order, and new blocks get
+    the first number that is not used by this file or left in Anki by one
+    of its deleted cards. Anchored blocks keep their ids, and a file that
+    has not been synced yet is numbered by position.
+    """
+    if not known_ids:
+        return [note_id for note_id, _, _ in blocks]
+
+    note_ids = [note_id if anchored else None for note_id, anchored, _ in blocks]
+    free = sorted(
+        (note_id for note_id in known_ids if note_id not in note_ids),
+        key=lambda note_id: manifest[note_id].get('block', 0)
+    )
+
+    # Unchanged cards follow their content
+    holders = {}
+    for note_id in free:
+        holders.setdefault(manifest[note_id].get('hash'), note_id)
+    for position, (_, _, digest) in enumerate(blocks):
+        if note_ids[position] is None and digest in holders:
+            note_ids[position] = holders.pop(digest)
+
+    # Edited cards take the notes that lost their content
+    free = [note_id for note_id in free if note_id not in note_ids]
+    unmatched = [position for position, note_id in enumerate(note_ids) if note_id is None]
+    for position, note_id in zip(unmatched, free):
+        note_ids[position] = note_id
+
+    # New cards get a fresh number
+    used = {note_id.lower() for note_id in known_ids}
+    used.update(note_id.lower() for note_id in note_ids if note_id)
+    number = 0
+    for position in unmatched[len(free):]:
+        while True:
+            note_id = block_note_id(file_id, None, number)
+            number += 1
+            if note_id.lower() not in used and note_id.lower() not in existing_notes:
+                break
+        note_ids[position] = note_id
+    return note_ids
+
+
+def record_note_ids(record):
+    """Every note id a scanned record accounts for"""
+    note_ids = list(record.get('entries', {}))
+    note_ids.extend(card['note_id'] for card in record.get('cards', []))
+    return note_ids
+
+
+def claim_note_ids(record, seen_ids):
+    """Register a record's note ids, or mark it as an error on a duplicate
+
+    `seen_ids` maps lowercased ids (Anki's tag search ignores case) to the
+    file that used them first. Returns False for a duplicate.
+    """
+    note_ids = record_note_ids(record) if record['state'] in ('up_to_date', 'card') else []
+    claimed = {}
+    for note_id in note_ids:
+        key = note_id.lower()
+        if key in seen_ids or key in claimed:
+            first = seen_ids.get(key) or claimed[key]
+            record.update(state='error', error=(
+                f"Duplicate ID {note_id[:16]}... in {record['file']} "
+                f"(already used by {first})"
+            ))
+            return False
+        claimed[key] = record['file']
+    seen_ids.update(claimed)
+    return True
+
+
+_scan_state = None
+
+
+def init_scan_worker(vault_path, manifest, entries_by_path, existing_notes, full,
+                     vault_index=None):
+    """Process pool initializer: keep the read-only sync state in each worker
+
+    The state (including the parent's prebuilt vault index) is pickled once
+    per worker instead of once per file. Workers only compute
+    content-addressed media names; uploads stay in the parent.
+    """
+    global _scan_state
+    if vault_index is not None:
+        reset_vault_index(vault_path, vault_index)
+    _scan_state = (vault_path, manifest, entries_by_path, existing_notes,
+                   MediaCache(transfer='stream'), full)
+
+
+def scan_card_file_worker(file_path):
+    """`scan_card_file` for a process pool set up by `init_scan_worker`
+
+    Returns a record made of plain strings, numbers, lists and dicts.
+    """
+    vault_path, manifest, entries_by_path, existing_notes, media_cache, full = _scan_state
+    return scan_card_file(file_path, vault_path, manifest, entries_by_path,
+                          existing_notes, media_cache, full)
+
+
+def create_scan_executor(jobs, vault_path, manifest, entries_by_path, existing_notes,
+                         media_cache, full=False):
+    """Return (executor, scan) for reading and rendering card files
+
+    `jobs` > 1 renders in that many worker processes, which sidesteps the
+    GIL for the regex-heavy markdown conversion; otherwise files are
+    scanned by threads sharing this process's media cache.
+    """
+    if jobs > 1:
+        # Build the index once here rather than once per worker
+        vault_index = get_vault_index(vault_path)
+        vault_index.build()
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=init_scan_worker,
+            initargs=(vault_path, manifest, entries_by_path, existing_notes, full, vault_index)
+        )
+        return executor, scan_card_file_worker
+
+    def scan(file_path):
+        return scan_card_file(file_path, vault_path, manifest, entries_by_path,
+                              existing_notes, media_cache, full)
+
+    executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix='anki-parse')
+    return executor, scan
+
+
+def find_card_files(anki_folder_path):
+    """Every markdown card file under the anki folder, in walk order"""
+    file_paths = []
+    for root, _, files in os.walk(anki_folder_path):
+        for file in files:
+            if file.endswith('.md') and not file.startswith('.'):
+                file_paths.append(os.path.join(root, file))
+    return file_paths
+
+
+async def run_sync_pipeline(file_paths, scan, scan_executor, media_cache, deck_name,
+                            existing_notes, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                            checkpoint=None, throttle=None, metrics=None, progress=None,
+                            report=None):
+    """Read, upload media for, and upsert cards as overlapping stages
+
+    Files are scanned by `scan` on `scan_executor` (see `create_scan_executor`)
+    while earlier batches are uploading media and being sent to Anki. AnkiConnect calls run in their
+    own pool of `concurrency` threads, which bounds the requests in flight.
+    Records are consumed in file order, so duplicate detection, batching and
+    the returned list of records are deterministic. Each card of a 'card'
+    record gets a 'result' of (status, value) like `sync_cards_batched`.
+    Cards confirmed by Anki are written to `checkpoint` batch by batch,
+    every request is paced by `throttle`, and time spent uploading media
+    and sending batches is added to `metrics`, each if given.
+    `progress(files_done, files_total, cards_sent)` is called whenever
+    files finish, and `report(record)` is called for every record in file
+    order as soon as the batch holding its cards is done.
+    """
+    loop = asyncio.get_running_loop()
+    rpc_pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='anki-rpc')
+    uploads = {}
+    done = {'files': 0, 'cards': 0}
+    unreported = deque()
+    in_flight = set()
+
+    def report_ready():
+        # A record waits for its own batch and for every earlier record
+        while unreported and id(unreported[0]) not in in_flight:
+            record = unreported.popleft()
+            if report is not None:
+                report(record)
+
+    def advance(files, cards=0):
+        done['files'] += files
+        done['cards'] += cards
+        if progress is not None:
+            progress(done['files'], len(file_paths), done['cards'])
+
+    def store_media(path):
+        with timed_stage(metrics, 'media_upload'):
+            return throttled(throttle, media_cache.store, path)
+
+    def send_batch(cards):
+        with timed_stage(metrics, 'anki_batches', len(cards)):
+            return sync_cards_batched(cards, deck_name, existing_notes, batch_size, throttle)
+
+    def upload(path):
+        if path not in uploads:
+            uploads[path] = loop.run_in_executor(rpc_pool, store_media, path)
+        return uploads[path]
+
+    async def flush(batch, batch_records):
         try:
-            new_note_id = add_note_to_anki(front, back, deck_name, note_id, tags)
-            return 'created', new_note_id
+            await send(batch)
         except Exception as e:
-            return 'error', str(e)
+            for card in batch:
+                card.setdefault('result', ('error', str(e)))
+        finally:
+            in_flight.difference_update(id(record) for record in batch_records)
+            report_ready()
+            advance(len(batch_records), len(batch))
+
+    async def send(batch):
+        for card in batch:
+            stored = await asyncio.gather(*(upload(path) for path in card['images']))
+            missing = [path for path, name in zip(card['images'], stored) if name is None]
+            if missing:
+                # Sync the card without that media; recording no signature
+                # for it makes the next sync retry the upload
+                entry = card['entry']
+                entry['media'].update(dict.fromkeys(missing))
+                entry['hash'] = card_hash(card['front'], card['back'], entry['media'])
+
+        results = await loop.run_in_executor(
+            rpc_pool, send_batch,
+            [(card['front'], card['back'], card['note_id']) for card in batch]
+        )
+        confirmed = {}
+        for card, result in zip(batch, results):
+            card['result'] = result
+            status, anki_id = result
+            if status in ('created', 'updated', 'unchanged'):
+                confirmed[card['note_id']] = dict(card['entry'], anki_id=anki_id)
+        if checkpoint is not None:
+            checkpoint.write(confirmed)
+
+    try:
+        scans = [loop.run_in_executor(scan_executor, scan, path) for path in file_paths]
+        records = []
+        seen_ids = {}
+        batch = []
+        batch_records = []
+        flushes = []
+
+        for pending in scans:
+            record = await pending
+            records.append(record)
+            unreported.append(record)
+
+            if not claim_note_ids(record, seen_ids) or record['state'] != 'card':
+                report_ready()
+                advance(1)
+                continue
+
+            # Start media uploads now so they overlap with parsing
+            for card in record['cards']:
+                for path, name in card['stored_names'].items():
+                    media_cache.remember(path, card['entry']['media'].get(path), name)
+                for path in card['images']:
+                    upload(path)
+            # All cards of a file join the same pipeline batch (though
+            # sync_cards_batched still splits it by batch size, and sends
+            # creates and updates as separate requests)
+            batch.extend(record['cards'])
+            batch_records.append(record)
+            in_flight.add(id(record))
+            if len(batch) >= batch_size:
+                flushes.append(asyncio.ensure_future(flush(batch, batch_records)))
+                batch = []
+                batch_records = []
+
+        if batch:
+            flushes.append(asyncio.ensure_future(flush(batch, batch_records)))
+        await asyncio.gather(*flushes)
+    finally:
+        rpc_pool.shutdown(wait=True)
+
+    return records
+
+
+def format_card_record(record, quiet=False):
+    """Console lines for a pipeline record
+
+    With `quiet`, files whose cards all synced produce no lines: only
+    warnings, skips, errors and the cards that failed are described.
+    """
+    lines = list(record['messages'])
+
+    if record['state'] == 'skipped':
+        lines.append(f"⏭️  Skipped ({record['reason']}): {record['file']}\n")
+        return lines
+    if record['state'] == 'error':
+        lines.append(f"❌ {record['error']}\n")
+        return lines
+    if record['state'] != 'card':
+        return lines
+
+    cards = record['cards']
+    if quiet:
+        cards = [card for card in cards if card['result'][0] == 'error']
+        if not cards:
+            # Name the file the warnings are about, without its cards
+            return [f"📝 {record['file']}", *lines, ""] if lines else []
+
+    lines.append(f"📝 {record['file']}" + (f" ({len(cards)} cards)" if len(cards) > 1 else ""))
+    for card in cards:
+        lines.append(f"   🔑 ID: {card['note_id'][:16]}...")
+        if card['images']:
+            lines.append(f"   🖼️  Images: {', '.join(os.path.basename(image) for image in card['images'])}")
+        lines.append(f"   Front: {card['front'][:50].replace('<br>', ' ')}...")
+        lines.append(f"   Back: {card['back'][:50].replace('<br>', ' ')}...")
+
+        status, result = card['result']
+        if status == 'created':
+            lines.append(f"   ✅ Created new card (Anki ID: {result})")
+        elif status == 'updated':
+            lines.append(f"   🔄 Updated existing card (Anki ID: {result})")
+        elif status == 'unchanged':
+            lines.append(f"   🟰 Already identical in Anki (Anki ID: {result})")
+        elif status == 'exported':
+            lines.append(f"   📦 Added to package (GUID: {result})")
+        elif status == 'error':
+            lines.append(f"   ❌ Error: {result}")
+    lines.append("")
+    return lines
+
+
+class SyncReporter:
+    """Console output and optional JSON-lines event stream of a sync
+
+    By default every card is described with Front/Back previews. With
+    `quiet`, only skips and errors are, and a progress bar shows the sync
+    advancing (a line every 10% when the output is not a terminal).
+    Console lines are collected and written in chunks (by default whenever
+    `progress` reports a finished batch), since a write per line is slow on
+    the Windows console and through the Shell Commands plugin; call `flush`
+    before printing anything else. Worker threads report through `warn`.
+    With `events_path`, every file and card outcome and every warning is
+    also written there as a JSON object per line, for tooling.
+    """
+
+    def __init__(self, quiet=False, events_path=None, stream=None):
+        self.quiet = quiet
+        self.stream = stream or sys.stdout
+        self.is_terminal = self.stream.isatty()
+        self.events = open(events_path, 'w', encoding='utf-8') if events_path else None
+        self._lines = []
+        self._buffered = 0
+        self._drawn_at = 0.0
+        self._step = 0
+        self._bar_open = False
+        self._warnings = []
+        self._lock = threading.Lock()
+        self._thread = threading.get_ident()
+
+    def write(self, lines):
+        self._end_bar()
+        lines = self._take_warnings() + list(lines)
+        self._lines.extend(lines)
+        self._buffered += sum(len(line) for line in lines)
+        if self._buffered >= OUTPUT_BUFFER_SIZE:
+            self.flush()
+
+    def warn(self, message):
+        """Report a warning line; safe to call from any thread
+
+        A warning from the thread that created the reporter is written right
+        away. Others (e.g. from media uploads) are written by that thread
+        with its next output, so they never break into the progress bar.
+        """
+        with self._lock:
+            self._warnings.append(message)
+        if threading.get_ident() == self._thread:
+            self.flush()
+
+    def _take_warnings(self):
+        with self._lock:
+            warnings, self._warnings = self._warnings, []
+        for message in warnings:
+            self.event('warning', message=message.strip())
+        return warnings
+
+    def flush(self):
+        warnings = self._take_warnings()
+        if warnings:
+            self._end_bar()
+            self._lines.extend(warnings)
+        if self._lines:
+            self.stream.write('\n'.join(self._lines) + '\n')
+            self._lines = []
+            self._buffered = 0
+        self.stream.flush()
+        if self.events is not None:
+            self.events.flush()
+
+    def close(self):
+        self.flush()
+        if self.events is not None:
+            self.events.close()
+            self.events = None
+
+    def event(self, kind, **fields):
+        """Write one event line, e.g. `{"event": "card", "file": ..., "status": ...}`"""
+        if self.events is not None:
+            self.events.write(json.dumps({'event': kind, 'time': round(time.time(), 3), **fields},
+                                         ensure_ascii=False) + '\n')
+
+    def record(self, record):
+        """Report the outcome of one scanned file"""
+        lines = format_card_record(record, self.quiet)
+        if lines:
+            self.write(lines)
+
+        if self.events is None:
+            return
+        if record['state'] == 'card':
+            for card in record['cards']:
+                status, result = card['result']
+                self.event('card', file=record['path'], note_id=card['note_id'], status=status,
+                           **({'error': result} if status == 'error' else {'anki_id': result}))
+        elif record['state'] == 'up_to_date':
+            self.event('up_to_date', file=record['path'], cards=len(record['entries']))
+        elif record['state'] == 'skipped':
+            self.event('skipped', file=record['path'], reason=record['reason'])
+        else:
+            self.event('error', file=record['path'], error=record['error'])
+
+    def progress(self, files_done, files_total, cards_sent):
+        """Advance the progress bar, or show the cards reported so far
+
+        Without `quiet` there is no bar; the lines collected since the last
+        call are written instead, at most every PROGRESS_INTERVAL seconds.
+        """
+        if not files_total:
+            return
+        finished = files_done >= files_total
+
+        if not self.quiet:
+            now = time.monotonic()
+            if ((self._lines or self._warnings)
+                    and (finished or now - self._drawn_at >= PROGRESS_INTERVAL)):
+                self._drawn_at = now
+                self.flush()
+            return
+        if self._lines or self._warnings:
+            # Skips, errors and warnings go above the bar
+            self.flush()
+        text = f"{files_done}/{files_total} files, {cards_sent} cards"
+
+        if self.is_terminal:
+            now = time.monotonic()
+            if not finished and now - self._drawn_at < PROGRESS_INTERVAL:
+                return
+            self._drawn_at = now
+            filled = PROGRESS_WIDTH * files_done // files_total
+            self.stream.write(f"\r📤 [{'█' * filled}{'·' * (PROGRESS_WIDTH - filled)}] {text}")
+            self._bar_open = True
+            if finished:
+                self._end_bar()
+            self.stream.flush()
+        else:
+            step = 10 * files_done // files_total
+            if step > self._step:
+                self._step = step
+                self.stream.write(f"📤 {text}\n")
+                self.stream.flush()
+        if finished:
+            self._step = 0
+
+    def _end_bar(self):
+        if self._bar_open:
+            self.stream.write('\n')
+            self._bar_open = False
+
+
+def manifest_entries_by_path(manifest):
+    """Group manifest note ids by the card file they came from"""
+    entries_by_path = {}
+    for note_id, entry in manifest.items():
+        entries_by_path.setdefault(entry.get('path'), []).append(note_id)
+    return entries_by_path
+
+
+def sync_card_files(file_paths, vault_path, deck_name, manifest, entries_by_path,
+                    existing_notes, media_cache, batch_size=BATCH_SIZE, full=False,
+                    concurrency=CONCURRENCY, jobs=JOBS, checkpoint=None, throttle=None,
+                    metrics=None, progress=None, report=None):
+    """Scan `file_paths` against the manifest and sync their changed cards
+
+    Returns the pipeline records in file order (see `run_sync_pipeline`).
+    """
+    scan_executor, scan = create_scan_executor(
+        jobs, vault_path, manifest, entries_by_path, existing_notes, media_cache, full
+    )
+    with scan_executor:
+        return asyncio.run(run_sync_pipeline(
+            file_paths, scan, scan_executor, media_cache, deck_name, existing_notes,
+            batch_size, concurrency, checkpoint, throttle, metrics, progress, report
+        ))
+
+
+def tally_records(records, entries_by_path):
+    """Count the outcome of a sync from its pipeline records
+
+    Returns (stats, manifest_entries, live_ids): counters for the summary
+    (plus the relative paths of files that had errors in 'failed'), the
+    manifest entries of every card now in Anki, and the note ids that
+    still have a card file.
+    """
+    stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'up_to_date': 0,
+             'skipped': [], 'errors': 0, 'failed': []}
+    new_manifest = {}
+    live_ids = set()
+    previous = {}
+
+    for record in records:
+        if record['state'] == 'up_to_date':
+            stats['up_to_date'] += 1
+            new_manifest.update(record['entries'])
+            live_ids.update(record['entries'])
+        elif record['state'] == 'skipped':
+            stats['skipped'].append(record['file'])
+        elif record['state'] == 'error':
+            stats['errors'] += 1
+            stats['failed'].append(record['path'])
+            # Never treat the notes of a file we failed to read as orphans,
+            # and keep tracking them until it can be read again
+            live_ids.update(entries_by_path.get(record['path'], []))
+            live_ids.update(record_note_ids(record))
+            previous.update(record.get('previous', {}))
+        else:
+            new_manifest.update(record['entries'])
+            live_ids.update(record_note_ids(record))
+            for card in record['cards']:
+                status, result = card['result']
+                if status in ('created', 'updated', 'unchanged'):
+                    stats[status] += 1
+                    card['entry']['anki_id'] = result
+                    new_manifest[card['note_id']] = card['entry']
+                else:
+                    stats['errors'] += 1
+                    if record['path'] not in stats['failed']:
+                        stats['failed'].append(record['path'])
+
+    # A card moved out of an unreadable file belongs to its new file
+    for note_id, entry in previous.items():
+        new_manifest.setdefault(note_id, entry)
+    return stats, new_manifest, live_ids
+
+
+class SyncMetrics:
+    """Timing and transfer report of one sync (`--metrics`)
+
+    Phases run one after another and are timed by wall clock. Pipeline
+    stages (reading, rendering, media upload, AnkiConnect batches) overlap,
+    so for them the busy seconds summed over all workers are recorded.
+    """
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.phases = {}
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def add_stage(self, name, seconds, count=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'count': 0})
+            stage['seconds'] += seconds
+            stage['count'] += count
+
+    def report(self, stats, media_cache, client):
+        """The metrics as a JSON-serializable dict"""
+        rpc = {}
+        for action, entry in sorted(client.stats.items()):
+            histogram = {f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, entry['histogram'])}
+            histogram[f">{LATENCY_BUCKETS_MS[-1]}"] = entry['histogram'][-1]
+            rpc[action] = {
+                'calls': entry['calls'],
+                'errors': entry['errors'],
+                'mean_ms': round(entry['seconds'] / entry['calls'] * 1000, 2),
+                'p95_ms': histogram_percentile(entry['histogram'], 0.95),
+                'max_ms': round(entry['max_seconds'] * 1000, 2),
+                'bytes_sent': entry['bytes_sent'],
+                'bytes_received': entry['bytes_received'],
+                'histogram_ms': histogram,
+            }
+
+        cards_synced = stats['created'] + stats['updated'] + stats['unchanged']
+        sync_seconds = self.phases.get('sync', 0.0)
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': round(sum(self.phases.values()), 3),
+            'cards': {
+                'created': stats['created'],
+                'updated': stats['updated'],
+                'unchanged': stats['unchanged'],
+                'files_up_to_date': stats['up_to_date'],
+                'files_skipped': len(stats['skipped']),
+                'errors': stats['errors'],
+            },
+            'cards_per_second': round(cards_synced / sync_seconds, 1) if sync_seconds else 0.0,
+            'phases': {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            'stages': {name: {'seconds': round(stage['seconds'], 3), 'count': stage['count']}
+                       for name, stage in self.stages.items()},
+            'rpc': rpc,
+            'multi_actions': dict(client.multi_actions),
+            'bytes_sent': sum(entry['bytes_sent'] for entry in client.stats.values()),
+            'bytes_received': sum(entry['bytes_received'] for entry in client.stats.values()),
+            'media': {
+                'transfer': media_cache.transfer,
+                'uploaded': media_cache.uploaded,
+                'reused': media_cache.reused,
+                'bytes_uploaded': media_cache.uploaded_bytes,
+            },
+        }
+
 
+def histogram_percentile(histogram, fraction):
+    """Upper bound (ms) of the latency bucket holding `fraction` of the calls
 
-def sync_to_anki(vault_path, deck_name):
-    """Sync notes from anki folder to Anki via AnkiConnect"""
+    None if it falls in the overflow bucket.
+    """
+    target = sum(histogram) * fraction
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS_MS, histogram):
+        seen += count
+        if seen >= target:
+            return bound
+    return None
+
+
+@contextlib.contextmanager
+def timed_stage(metrics, name, count=1):
+    """Add the time spent in the block to a `SyncMetrics` stage, if any"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add_stage(name, time.perf_counter() - started, count)
+
+
+def format_bytes(size):
+    """Human-readable byte count"""
+    if size < 1024:
+        return f"{size} B"
+    for unit in ('KB', 'MB'):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GB"
+
+
+def print_metrics(report):
+    """Timing and transfer lines for the sync summary"""
+    phases = ', '.join(f"{name.replace('_', ' ')} {seconds:.2f}s"
+                       for name, seconds in report['phases'].items())
+    print(f"⏱️  Phases: {phases}")
+    if report['stages']:
+        stages = ', '.join(f"{name.replace('_', ' ')} {stage['seconds']:.2f}s"
+                           for name, stage in report['stages'].items())
+        print(f"🧵 Busy time: {stages}")
+    for action, entry in report['rpc'].items():
+        p95 = f"≤{entry['p95_ms']} ms" if entry['p95_ms'] is not None else f">{LATENCY_BUCKETS_MS[-1]} ms"
+        print(f"   • {action}: {entry['calls']} calls, avg {entry['mean_ms']:.1f} ms, "
+              f"p95 {p95}, sent {format_bytes(entry['bytes_sent'])}")
+    print(f"📦 Sent to AnkiConnect: {format_bytes(report['bytes_sent'])} "
+          f"(media uploaded: {format_bytes(report['media']['bytes_uploaded'])})")
+
+
+def sync_to_anki(vault_path, deck_name, batch_size=BATCH_SIZE, full=False,
+                 manifest_path=MANIFEST_PATH, concurrency=CONCURRENCY, jobs=JOBS,
+                 prune=False, dry_run=False, target_latency=TARGET_LATENCY_MS,
+                 metrics_path=None, reporter=None):
+    """Sync notes from anki folder to Anki via AnkiConnect
+
+    Files whose size, mtime and media are unchanged since the last sync
+    recorded in the manifest are skipped before parsing, unless `full` is set.
+    Afterwards `run_maintenance` clears unused tags and, with `prune`,
+    deletes (or with `dry_run` lists) notes whose card file is gone.
+    A `target_latency` in milliseconds turns on `AdaptiveThrottle`, and
+    a `metrics_path` gets the `SyncMetrics` report as JSON. Per-file
+    results go to `reporter` (see `SyncReporter`).
+    """
     anki_folder_path = os.path.join(vault_path, ANKI_FOLDER)
+    reporter = reporter or SyncReporter()
 
     if not os.path.exists(anki_folder_path):
         print(f"❌ Error: Anki folder does not exist: {anki_folder_path}")
@@ -379,49 +2201,98 @@ def sync_to_anki(vault_path, deck_name):
 
     print(f"📂 Scanning folder: {anki_folder_path}\n")
 
-    cards_created = 0
-    cards_updated = 0
-    skipped = []
-    errors = 0
+    throttle = None
+    if target_latency:
+        # Requests queue up on Anki's main thread anyway; one at a time
+        # keeps the measured latency honest and leaves gaps for the UI
+        throttle = AdaptiveThrottle(target_latency, batch_size)
+        concurrency = 1
+        print(f"🎚️  Adaptive throttling: aiming for {target_latency:g} ms per request")
 
-    # Walk through anki folder
-    for root, _, files in os.walk(anki_folder_path):
-        for file in files:
-            if file.endswith('.md') and not file.startswith('.'):
-                file_path = os.path.join(root, file)
+    client = get_client()
+    client.pool_size = max(client.pool_size, concurrency)
+    client.reset_stats()
+    metrics = SyncMetrics()
 
-                front, back, images, note_id = parse_card_from_template(file_path, vault_path)
+    try:
+        with metrics.phase('fetch_notes'):
+            existing_notes = fetch_existing_notes(batch_size, throttle)
+    except Exception as e:
+        print(f"❌ Could not load existing notes from Anki: {e}")
+        return
+    print(f"🔎 Found {len(existing_notes)} tracked notes in Anki")
 
-                if front and back and note_id:
-                    try:
-                        print(f"📝 {file}")
-                        print(f"   🔑 ID: {note_id[:16]}...")
-                        if images:
-                            print(f"   🖼️  Images: {', '.join(images)}")
-                        print(f"   Front: {front[:50].replace('<br>', ' ')}...")
-                        print(f"   Back: {back[:50].replace('<br>', ' ')}...")
-
-                        status, result = sync_or_update_note(front, back, deck_name, note_id)
-
-                        if status == 'created':
-                            print(f"   ✅ Created new card (Anki ID: {result})")
-                            cards_created += 1
-                        elif status == 'updated':
-                            print(f"   🔄 Updated existing card (Anki ID: {result})")
-                            cards_updated += 1
-                        elif status == 'error':
-                            print(f"   ❌ Error: {result}")
-                            errors += 1
-                        print()
-                    except Exception as e:
-                        print(f"   ❌ Error: {e}\n")
-                        errors += 1
-                else:
-                    skipped.append(file)
-                    if not front and not back:
-                        print(f"⏭️  Skipped (no Front:/Back: template found): {file}\n")
-                    else:
-                        print(f"⏭️  Skipped (could not generate ID): {file}\n")
+    try:
+        with metrics.phase('list_media'):
+            media_cache = MediaCache.from_anki(warn=reporter.warn)
+        print(f"🖼️  Found {len(media_cache.stored_names)} media files in Anki")
+    except Exception as e:
+        print(f"⚠️  Warning: Could not list Anki media, uploading all referenced images: {e}")
+        media_cache = MediaCache(warn=reporter.warn)
+
+    if media_cache.transfer == 'path':
+        print("📡 Media transfer: path (AnkiConnect is local, files are read from disk)")
+    else:
+        print("📡 Media transfer: stream (base64 body encoded in chunks)")
+
+    # Attachments are indexed at most once per run, on first use
+    reset_vault_index(vault_path)
+
+    manifest = load_manifest(manifest_path)
+    journal_path = checkpoint_path(manifest_path)
+    resumed = read_checkpoint(journal_path)
+    if resumed:
+        manifest.update(resumed)
+        print(f"♻️  Resuming an interrupted sync: {len(resumed)} cards were already confirmed")
+    entries_by_path = manifest_entries_by_path(manifest)
+
+    if full:
+        print("🔁 Full resync requested, ignoring manifest\n")
+    else:
+        print(f"🗂️  Manifest: {len(manifest)} notes recorded\n")
+
+    with metrics.phase('walk'):
+        file_paths = find_card_files(anki_folder_path)
+
+    print(f"📤 Syncing {len(file_paths)} files in batches of {batch_size} "
+          f"({concurrency} requests in flight"
+          f"{f', {jobs} parser processes' if jobs > 1 else ''})...\n")
+    reporter.event('start', deck=deck_name, files=len(file_paths))
+    checkpoint = SyncCheckpoint(journal_path)
+    try:
+        with metrics.phase('sync'):
+            records = sync_card_files(file_paths, vault_path, deck_name, manifest,
+                                      entries_by_path, existing_notes, media_cache, batch_size,
+                                      full, concurrency, jobs, checkpoint, throttle, metrics,
+                                      reporter.progress, reporter.record)
+    finally:
+        checkpoint.close()
+        reporter.flush()
+    sync_seconds = metrics.phases['sync']
+    for record in records:
+        for stage, seconds in record.get('timings', {}).items():
+            metrics.add_stage(stage, seconds)
+
+    stats, new_manifest, live_ids = tally_records(records, entries_by_path)
+    cards_created = stats['created']
+    cards_updated = stats['updated']
+    cards_unchanged = stats['unchanged']
+    up_to_date = stats['up_to_date']
+    skipped = stats['skipped']
+    errors = stats['errors']
+
+    try:
+        with metrics.phase('save_manifest'):
+            save_manifest(new_manifest, manifest_path)
+    except OSError as e:
+        print(f"⚠️  Warning: Could not save manifest {manifest_path}: {e}")
+
+    with metrics.phase('maintenance'):
+        orphans_deleted = run_maintenance(existing_notes, live_ids, prune, dry_run, batch_size,
+                                          reporter.warn)
+    report = metrics.report(stats, media_cache, client)
+    reporter.event('summary', **report['cards'], cards_per_second=report['cards_per_second'],
+                   seconds=report['seconds'])
 
     # Summary
     print("="*60)
@@ -429,7 +2300,22 @@ def sync_to_anki(vault_path, deck_name):
     print("="*60)
     print(f"✅ Cards created: {cards_created}")
     print(f"🔄 Cards updated: {cards_updated}")
+    print(f"🟰 Cards unchanged: {cards_unchanged}")
+    print(f"⏩ Files up to date: {up_to_date}")
+    print(f"🖼️  Media uploaded: {media_cache.uploaded} (reused: {media_cache.reused})")
+    requests, request_errors, mean_ms = get_client().summary()
+    print(f"🔌 AnkiConnect requests: {requests} (avg {mean_ms:.1f} ms, failed: {request_errors})")
+    cards_synced = cards_created + cards_updated + cards_unchanged
+    print(f"⚡ Throughput: {cards_synced / sync_seconds if sync_seconds else 0:.1f} cards/sec "
+          f"({cards_synced} cards in {sync_seconds:.1f}s)")
+    if throttle:
+        print(f"🎚️  Throttle: median {throttle.median_ms():.0f} ms per request "
+              f"(target {target_latency:g} ms), Anki busy {throttle.busy_seconds:.1f}s, "
+              f"final batch {throttle.batch_size}, pause {throttle.pause:.2f}s")
+    print_metrics(report)
     print(f"⏭️  Files skipped: {len(skipped)}")
+    if prune and not dry_run:
+        print(f"🗑️  Orphaned notes deleted: {orphans_deleted}")
     print(f"❌ Errors: {errors}")
     print("="*60)
 
@@ -440,13 +2326,656 @@ def sync_to_anki(vault_path, deck_name):
         print(f"   • {cards_created} new cards created")
         print(f"   • {cards_updated} existing cards updated")
         print(f"📦 Deck: {deck_name}")
+    elif (up_to_date > 0 or cards_unchanged > 0) and errors == 0:
+        print("\n✅ Everything is already up to date")
     else:
         print(f"\n⚠️  No cards were synced")
 
+    if metrics_path:
+        try:
+            with open(metrics_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"📈 Metrics written to {metrics_path}")
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write metrics {metrics_path}: {e}")
+
     return total_synced
 
 
-if __name__ == "__main__":
+def snapshot_folder(folder, suffix=''):
+    """Map every file under `folder` (ending in `suffix`) to its signature"""
+    snapshot = {}
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.startswith('.') or not file.endswith(suffix):
+                continue
+            path = os.path.join(root, file)
+            try:
+                snapshot[path] = file_signature(path)
+            except OSError:
+                # Removed while we were walking
+                pass
+    return snapshot
+
+
+def connect_watch_state(deck_name, batch_size=BATCH_SIZE, throttle=None, warn=print):
+    """(existing_notes, media_cache) loaded from Anki, or None if it is unreachable
+
+    Media upload warnings go to `warn`.
+    """
+    try:
+        version = invoke_anki_connect('version')
+    except Exception:
+        return None
+
+    print(f"✅ Connected to AnkiConnect (version {version})")
+    if not ensure_deck_exists(deck_name):
+        return None
+    try:
+        existing_notes = fetch_existing_notes(batch_size, throttle)
+        media_cache = MediaCache.from_anki(warn=warn)
+    except Exception as e:
+        print(f"❌ Could not load notes and media from Anki: {e}")
+        return None
+    print(f"🔎 Found {len(existing_notes)} tracked notes and "
+          f"{len(media_cache.stored_names)} media files in Anki\n")
+    return existing_notes, media_cache
+
+
+def run_watch_cycle(changes, vault_path, deck_name, manifest, existing_notes, media_cache,
+                    batch_size=BATCH_SIZE, concurrency=CONCURRENCY, jobs=JOBS,
+                    prune=False, dry_run=False, throttle=None, reporter=None):
+    """Sync the card files affected by a set of changed paths
+
+    Changed card files are rescanned, and so are the cards whose images
+    changed (found through the media recorded in the manifest) or whose
+    missing images turned up. Notes of
+    deleted card files are deleted with `prune`; a file that comes back as
+    an 'error' record (e.g. unreadable) keeps its manifest entries and notes
+    until it syncs again. `manifest` is updated in place. Per-file results go to `reporter`. Returns the tallied stats
+    (see `tally_records`).
+    """
+    reporter = reporter or SyncReporter()
+    anki_folder_path = os.path.join(vault_path, ANKI_FOLDER)
+    card_paths = set()
+    deleted_paths = set()
+    changed_media = set()
+    for path in changes:
+        if path.endswith('.md') and path.startswith(anki_folder_path + os.sep):
+            (card_paths if os.path.exists(path) else deleted_paths).add(path)
+        else:
+            changed_media.add(os.path.normcase(path))
+
+    if changed_media:
+        # Images are matched by name, like Obsidian resolves them, so a newly
+        # added file also fixes the cards that referenced it while missing
+        changed_names = {os.path.basename(path).lower() for path in changed_media}
+        for entry in manifest.values():
+            if (any(os.path.normcase(image) in changed_media for image in entry.get('media', {}))
+                    or any(os.path.basename(reference).lower() in changed_names
+                           for reference in entry.get('missing', []))):
+                card_paths.add(os.path.join(vault_path, *entry['path'].split('/')))
+
+    def relative(path):
+        return os.path.relpath(path, vault_path).replace(os.sep, '/')
+
+    entries_by_path = manifest_entries_by_path(manifest)
+    file_paths = sorted(path for path in card_paths if os.path.exists(path))
+
+    # New attachments must be resolvable by the cards that were just edited
+    reset_vault_index(vault_path)
+    records = sync_card_files(file_paths, vault_path, deck_name, manifest, entries_by_path,
+                              existing_notes, media_cache, batch_size, False, concurrency, jobs,
+                              throttle=throttle, progress=reporter.progress,
+                              report=reporter.record)
+    reporter.flush()
+    stats, new_entries, live_ids = tally_records(records, entries_by_path)
+
+    failed = {record['path'] for record in records if record['state'] == 'error'}
+    removed_ids = set()
+    for path in [relative(path) for path in file_paths + sorted(deleted_paths)]:
+        if path in failed:
+            continue
+        for note_id in entries_by_path.get(path, []):
+            manifest.pop(note_id, None)
+            removed_ids.add(note_id)
+    manifest.update(new_entries)
+
+    # Cards moved to another file keep their notes
+    orphans = sorted(
+        (note_id, existing_notes[note_id.lower()]['anki_id'])
+        for note_id in removed_ids - live_ids
+        if note_id not in manifest and note_id.lower() in existing_notes
+    )
+    if orphans and prune and dry_run:
+        print(f"🔍 [DRY RUN] Would delete {len(orphans)} notes whose card was removed:")
+        for note_id, anki_id in orphans:
+            print(f"   • {note_id} (Anki ID: {anki_id})")
+    elif orphans and prune:
+        deleted = delete_orphaned_notes(orphans, batch_size, reporter.warn)
+        for note_id, _ in orphans[:deleted]:
+            existing_notes.pop(note_id.lower(), None)
+        print(f"🗑️  Deleted {deleted} notes whose card was removed")
+    elif orphans:
+        print(f"ℹ️  {len(orphans)} notes in Anki no longer have a card (use --prune to delete them)")
+
+    return stats
+
+
+def watch_and_sync(vault_path, deck_name, batch_size=BATCH_SIZE, manifest_path=MANIFEST_PATH,
+                   concurrency=CONCURRENCY, jobs=JOBS, prune=False, dry_run=False,
+                   interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE,
+                   target_latency=TARGET_LATENCY_MS, reporter=None):
+    """Keep Anki in sync with the anki folder until interrupted
+
+    Polls `anki/` and `media/` every `interval` seconds, which needs no
+    extra packages and works on synced and network folders too. A burst of
+    edits is collected until nothing has changed for `debounce` seconds,
+    then only the affected cards are synced (see `run_watch_cycle`). Never
+    prompts: while AnkiConnect is unreachable changes are kept, and once it
+    answers again the note and media state is reloaded and they are synced.
+    """
+    reporter = reporter or SyncReporter()
+    anki_folder_path = os.path.join(vault_path, ANKI_FOLDER)
+    media_folder_path = os.path.join(vault_path, MEDIA_FOLDER)
+
+    if not os.path.exists(anki_folder_path):
+        print(f"❌ Error: Anki folder does not exist: {anki_folder_path}")
+        print(f"Please make sure the '{ANKI_FOLDER}' folder exists in your vault.")
+        return
+
+    def take_snapshot():
+        snapshot = snapshot_folder(anki_folder_path, '.md')
+        snapshot.update(snapshot_folder(media_folder_path))
+        return snapshot
+
+    throttle = None
+    if target_latency:
+        throttle = AdaptiveThrottle(target_latency, batch_size)
+        concurrency = 1
+
+    client = get_client()
+    client.pool_size = max(client.pool_size, concurrency)
+
+    manifest = load_manifest(manifest_path)
+    manifest.update(read_checkpoint(checkpoint_path(manifest_path)))
+    snapshot = take_snapshot()
+    # Catch up on edits made while nothing was watching
+    pending = {path for path in snapshot if path.endswith('.md')}
+    retry = set()
+    last_change = 0.0
+    state = None
+    waiting = False
+
+    print(f"👀 Watching {anki_folder_path} and {media_folder_path} "
+          f"every {interval:g}s (Ctrl+C to stop)\n")
+
+    try:
+        while True:
+            if state is None:
+                state = connect_watch_state(deck_name, batch_size, throttle, reporter.warn)
+                if state is None:
+                    if not waiting:
+                        print(f"⏳ Waiting for AnkiConnect at {ANKI_CONNECT_URL}...")
+                        waiting = True
+                else:
+                    # Files that failed while Anki was away are retried right away
+                    waiting = False
+                    pending |= retry
+                    retry = set()
+
+            if state is not None and pending and time.monotonic() - last_change >= debounce:
+                changes = pending | retry
+                pending, retry = set(), set()
+                existing_notes, media_cache = state
+
+                print(f"🔁 [{datetime.now():%H:%M:%S}] Syncing {len(changes)} changed files...\n")
+                try:
+                    stats = run_watch_cycle(changes, vault_path, deck_name, manifest,
+                                            existing_notes, media_cache, batch_size,
+                                            concurrency, jobs, prune, dry_run, throttle,
+                                            reporter)
+                except Exception as e:
+                    print(f"❌ Sync failed: {e}")
+                    stats = None
+                    retry = changes
+                else:
+                    retry = {os.path.join(vault_path, *path.split('/')) for path in stats['failed']}
+                    reporter.event('cycle', files=len(changes), created=stats['created'],
+                                   updated=stats['updated'], unchanged=stats['unchanged'],
+                                   up_to_date=stats['up_to_date'], errors=stats['errors'])
+                    reporter.flush()
+                    print(f"   ✅ {stats['created']} created, 🔄 {stats['updated']} updated, "
+                          f"🟰 {stats['unchanged']} unchanged, ⏩ {stats['up_to_date']} up to date, "
+                          f"❌ {stats['errors']} errors\n")
+
+                try:
+                    save_manifest(manifest, manifest_path)
+                except OSError as e:
+                    print(f"⚠️  Warning: Could not save manifest {manifest_path}: {e}")
+
+                if stats is None or stats['errors']:
+                    try:
+                        invoke_anki_connect('version')
+                        # Notes may have been edited or deleted in Anki; failed
+                        # files are retried with the next change
+                        state = (fetch_existing_notes(batch_size, throttle), media_cache)
+                    except Exception:
+                        print("⚠️  Lost the connection to AnkiConnect, failed files will be retried")
+                        state = None
+
+            time.sleep(interval)
+            current = take_snapshot()
+            changed = {path for path in snapshot.keys() | current.keys()
+                       if snapshot.get(path) != current.get(path)}
+            snapshot = current
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+
+
+# Legacy (schema 11) collection layout; every Anki version can import it
+APKG_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null,
+    scm integer not null, ver integer not null, dty integer not null,
+    usn integer not null, ls integer not null, conf text not null,
+    models text not null, decks text not null, dconf text not null,
+    tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null,
+    mod integer not null, usn integer not null, tags text not null,
+    flds text not null, sfld integer not null, csum integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null,
+    ord integer not null, mod integer not null, usn integer not null,
+    type integer not null, queue integer not null, due integer not null,
+    ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null,
+    odid integer not null, flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null,
+    ease integer not null, ivl integer not null, lastIvl integer not null,
+    factor integer not null, time integer not null, type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn ON notes (usn);
+CREATE INDEX ix_cards_usn ON cards (usn);
+CREATE INDEX ix_revlog_usn ON revlog (usn);
+CREATE INDEX ix_cards_nid ON cards (nid);
+CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+CREATE INDEX ix_revlog_cid ON revlog (cid);
+CREATE INDEX ix_notes_csum ON notes (csum);
+"""
+
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def stable_anki_id(name):
+    """Deterministic deck/note type id, so every export reuses the same ones"""
+    return (1 << 30) + int(hashlib.sha1(name.encode('utf-8')).hexdigest()[:8], 16) % (1 << 30)
+
+
+def note_guid(note_id):
+    """Anki GUID for a note id
+
+    Anki matches imported notes by GUID, so deriving it from the note id
+    makes re-importing a package update the notes instead of duplicating them.
+    """
+    return hashlib.sha1(f"obsidian:{note_id.lower()}".encode('utf-8')).hexdigest()[:20]
+
+
+def apkg_collection_row(deck_name, deck_id, model_id, now):
+    """The single `col` row: config, note type, deck and deck options"""
+    model = {
+        'id': model_id,
+        'name': APKG_MODEL_NAME,
+        'type': 0,
+        'mod': now,
+        'usn': -1,
+        'sortf': 0,
+        'did': deck_id,
+        'tmpls': [{
+            'name': 'Card 1',
+            'ord': 0,
+            'qfmt': '{{Front}}',
+            'afmt': '{{FrontSide}}\n\n<hr id=answer>\n\n{{Back}}',
+            'did': None,
+            'bqfmt': '',
+            'bafmt': '',
+        }],
+        'flds': [
+            {'name': name, 'ord': ord, 'sticky': False, 'rtl': False,
+             'font': 'Arial', 'size': 20, 'media': []}
+            for ord, name in enumerate(('Front', 'Back'))
+        ],
+        'css': '.card {\n font-family: arial;\n font-size: 20px;\n text-align: center;\n'
+               ' color: black;\n background-color: white;\n}\n',
+        'latexPre': '\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n'
+                    '\\usepackage[utf8]{inputenc}\n\\usepackage{amssymb,amsmath}\n'
+                    '\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n',
+        'latexPost': '\\end{document}',
+        'latexsvg': False,
+        'req': [[0, 'any', [0]]],
+        'tags': [],
+        'vers': [],
+    }
+
+    def deck(id, name):
+        return {
+            'id': id, 'name': name, 'desc': '', 'conf': 1, 'dyn': 0,
+            'mod': now, 'usn': -1, 'collapsed': False, 'browserCollapsed': False,
+            'extendNew': 0, 'extendRev': 50, 'newToday': [0, 0],
+            'revToday': [0, 0], 'lrnToday': [0, 0], 'timeToday': [0, 0],
+        }
+
+    deck_options = {
+        'id': 1, 'name': 'Default', 'mod': 0, 'usn': 0, 'maxTaken': 60,
+        'autoplay': True, 'timer': 0, 'replayq': True, 'dyn': False,
+        'new': {'delays': [1, 10], 'ints': [1, 4, 7], 'initialFactor': 2500,
+                'order': 1, 'perDay': 20, 'bury': True, 'separate': True},
+        'rev': {'perDay': 200, 'ease4': 1.3, 'fuzz': 0.05, 'ivlFct': 1,
+                'maxIvl': 36500, 'minSpace': 1, 'bury': True},
+        'lapse': {'delays': [10], 'mult': 0, 'minInt': 1, 'leechFails': 8,
+                  'leechAction': 0},
+    }
+
+    conf = {
+        'activeDecks': [1], 'curDeck': 1, 'curModel': str(model_id),
+        'newSpread': 0, 'collapseTime': 1200, 'timeLim': 0, 'estTimes': True,
+        'dueCounts': True, 'nextPos': 1, 'sortType': 'noteFld',
+        'sortBackwards': False, 'addToCur': True,
+    }
+
+    return (
+        1, now, now * 1000, now * 1000, 11, 0, 0, 0,
+        json.dumps(conf),
+        json.dumps({str(model_id): model}),
+        json.dumps({'1': deck(1, 'Default'), str(deck_id): deck(deck_id, deck_name)}),
+        json.dumps({'1': deck_options}),
+        '{}',
+    )
+
+
+class ApkgWriter:
+    """Stream notes and media into an .apkg package
+
+    Notes go into a `collection.anki2` SQLite file in a temp dir, and media
+    is copied into the zip as soon as it is added, so nothing is held in
+    memory. `close` appends the collection and the `media` manifest and
+    moves the package into place; until then `output_path` is untouched.
+    """
+
+    def __init__(self, output_path, deck_name):
+        self.output_path = output_path
+        self.deck_name = deck_name
+        self.deck_id = stable_anki_id(f"deck:{deck_name}")
+        self.model_id = stable_anki_id(f"model:{APKG_MODEL_NAME}")
+        self.notes = 0
+        self.media_files = 0
+        self.media_bytes = 0
+        self._media = {}
+        self._media_names = set()
+        self._next_id = int(time.time() * 1000)
+
+        self._dir = tempfile.mkdtemp(prefix='anki-apkg-')
+        self._collection_path = os.path.join(self._dir, 'collection.anki2')
+        self._db = sqlite3.connect(self._collection_path)
+        self._db.executescript(APKG_SCHEMA)
+        self._zip_path = os.path.join(
+            os.path.dirname(os.path.abspath(output_path)),
+            f".{os.path.basename(output_path)}.tmp"
+        )
+        self._zip = zipfile.ZipFile(self._zip_path, 'w', zipfile.ZIP_DEFLATED)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_media(self, file_path, filename):
+        """Copy a media file into the package once per Anki file name"""
+        if filename in self._media_names:
+            return
+        member = str(self.media_files)
+        # Images are already compressed; storing them is much cheaper
+        self._zip.write(file_path, member, compress_type=zipfile.ZIP_STORED)
+        self._media[member] = filename
+        self._media_names.add(filename)
+        self.media_files += 1
+        self.media_bytes += os.path.getsize(file_path)
+
+    def add_note(self, front, back, note_id):
+        """Add a new Front/Back note (and its card) to the collection"""
+        note_ts = self._next_id
+        self._next_id += 2
+        now = int(time.time())
+        sort_field = HTML_TAG_PATTERN.sub('', front)
+        checksum = int(hashlib.sha1(sort_field.encode('utf-8')).hexdigest()[:8], 16)
+
+        self._db.execute(
+            'INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (note_ts, note_guid(note_id), self.model_id, now, -1,
+             f" {' '.join(card_tags(note_id))} ", f"{front}\x1f{back}",
+             sort_field, checksum, 0, '')
+        )
+        self._db.execute(
+            'INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (note_ts + 1, note_ts, self.deck_id, 0, now, -1, 0, 0, self.notes,
+             0, 0, 0, 0, 0, 0, 0, 0, '')
+        )
+        self.notes += 1
+
+    def close(self):
+        """Finish the collection and write the package to `output_path`"""
+        now = int(time.time())
+        self._db.execute(
+            'INSERT INTO col VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            apkg_collection_row(self.deck_name, self.deck_id, self.model_id, now)
+        )
+        self._db.commit()
+        self._db.close()
+
+        try:
+            self._zip.write(self._collection_path, 'collection.anki2')
+            self._zip.writestr('media', json.dumps(self._media))
+            self._zip.close()
+            os.replace(self._zip_path, self.output_path)
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    def abort(self):
+        """Discard the partial package"""
+        self._db.close()
+        self._zip.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+        if os.path.exists(self._zip_path):
+            os.remove(self._zip_path)
+
+
+def export_to_apkg(vault_path, deck_name, output_path=APKG_PATH, jobs=JOBS, reporter=None):
+    """Write every card in the anki folder to an .apkg file for File > Import
+
+    Cards are parsed and rendered exactly as for a sync, in one streaming
+    pass, but nothing is sent to AnkiConnect (Anki doesn't even have to be
+    running). Notes carry the same tracking tags as synced ones and a GUID
+    derived from their note id, so importing a newer package updates the
+    notes and a later AnkiConnect sync finds them by tag. Per-file results
+    go to `reporter` (see `SyncReporter`).
+    """
+    reporter = reporter or SyncReporter()
+    anki_folder_path = os.path.join(vault_path, ANKI_FOLDER)
+
+    if not os.path.exists(anki_folder_path):
+        print(f"❌ Error: Anki folder does not exist: {anki_folder_path}")
+        print(f"Please make sure the '{ANKI_FOLDER}' folder exists in your vault.")
+        return
+
+    print(f"📂 Scanning folder: {anki_folder_path}\n")
+
+    # Only computes content-addressed names; nothing is uploaded
+    media_cache = MediaCache(transfer='stream')
+    reset_vault_index(vault_path)
+
+    file_paths = find_card_files(anki_folder_path)
+    scan_executor, scan = create_scan_executor(jobs, vault_path, {}, {}, {}, media_cache, full=True)
+
+    print(f"📦 Exporting {len(file_paths)} files to {output_path}"
+          f"{f' ({jobs} parser processes)' if jobs > 1 else ''}...\n")
+
+    cards_exported = 0
+    skipped = []
+    errors = 0
+    seen_ids = {}
+
+    reporter.event('start', deck=deck_name, files=len(file_paths), output=output_path)
+    with scan_executor, ApkgWriter(output_path, deck_name) as writer:
+        records = scan_executor.map(scan, file_paths, chunksize=64 if jobs > 1 else 1)
+        for files_done, record in enumerate(records, 1):
+            if claim_note_ids(record, seen_ids) and record['state'] == 'card':
+                for card in record['cards']:
+                    try:
+                        for path in card['images']:
+                            writer.add_media(path, card['stored_names'].get(path)
+                                             or media_cache.stored_name(path))
+                        writer.add_note(card['front'], card['back'], card['note_id'])
+                        card['result'] = ('exported', note_guid(card['note_id']))
+                        cards_exported += 1
+                    except OSError as e:
+                        card['result'] = ('error', f"media file unreadable: {e}")
+                        errors += 1
+
+            reporter.record(record)
+            reporter.progress(files_done, len(file_paths), cards_exported)
+            if record['state'] == 'skipped':
+                skipped.append(record['file'])
+            elif record['state'] == 'error':
+                errors += 1
+
+    reporter.event('summary', exported=cards_exported, files_skipped=len(skipped), errors=errors)
+    reporter.flush()
+
+    # Summary
+    print("="*60)
+    print("📊 EXPORT SUMMARY")
+    print("="*60)
+    print(f"📦 Cards exported: {cards_exported}")
+    print(f"🖼️  Media files: {writer.media_files} ({writer.media_bytes / 1024:.0f} KB)")
+    print(f"⏭️  Files skipped: {len(skipped)}")
+    print(f"❌ Errors: {errors}")
+    print("="*60)
+
+    if cards_exported > 0:
+        print(f"\n✅ Wrote {output_path}")
+        print(f"   Import it in Anki with File > Import (deck: {deck_name})")
+    else:
+        print("\n⚠️  No cards were exported")
+
+    return cards_exported
+
+
+def main():
+    """Main entry point with CLI argument parsing"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Sync Front:/Back: markdown cards to Anki via AnkiConnect'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=BATCH_SIZE,
+        help=f'Notes per AnkiConnect request (default: {BATCH_SIZE})'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=CONCURRENCY,
+        help=f'Maximum AnkiConnect requests in flight (default: {CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=JOBS,
+        help='Parse and render cards in N worker processes (default: 1, threads only)'
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Ignore the manifest and resync every card'
+    )
+    parser.add_argument(
+        '--prune',
+        action='store_true',
+        help='Delete Anki notes whose card file no longer exists'
+    )
+    parser.add_argument(
+        '--prune-dry-run',
+        action='store_true',
+        help='List the notes --prune would delete without deleting them '
+             '(cards are still synced)'
+    )
+    parser.add_argument(
+        '--target-latency',
+        type=float,
+        default=TARGET_LATENCY_MS,
+        metavar='MS',
+        help='Adapt batch size and pacing to keep each AnkiConnect request near MS '
+             'milliseconds, so Anki stays usable during the sync (default: off)'
+    )
+    parser.add_argument(
+        '--metrics',
+        metavar='PATH',
+        help='Write phase timings, per-action request counts and latency histograms, '
+             'bytes sent and cards/sec of the sync to PATH as JSON'
+    )
+    parser.add_argument(
+        '--quiet',
+        action='store_true',
+        help='Show a progress bar instead of every card; only skipped files and '
+             'errors are described'
+    )
+    parser.add_argument(
+        '--events',
+        metavar='PATH',
+        help='Write every file and card outcome to PATH as JSON lines, for tooling'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and sync card and media changes as they happen (no prompts)'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=WATCH_INTERVAL,
+        help=f'Seconds between folder scans in --watch mode (default: {WATCH_INTERVAL:g})'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['ankiconnect', 'apkg'],
+        default='ankiconnect',
+        help='Sync through AnkiConnect, or write an .apkg file to import (default: ankiconnect)'
+    )
+    parser.add_argument(
+        '--output',
+        default=APKG_PATH,
+        help='Package path for --backend apkg (default: scripts/anki-export.apkg)'
+    )
+
+    args = parser.parse_args()
+    prune = args.prune or args.prune_dry_run
+
     print("="*60)
     print("📇 OBSIDIAN TO ANKI SYNC via AnkiConnect")
     print("="*60)
@@ -461,8 +2990,41 @@ if __name__ == "__main__":
     print(f"\n📍 Vault path: {VAULT_PATH}")
     print(f"📂 Anki folder: {ANKI_FOLDER}/")
     print(f"📦 Deck name: {DECK_NAME}")
+
+    if args.backend == 'apkg':
+        print(f"💾 Package: {args.output}")
+        response = input("\n🚀 Export notes to an .apkg file? [Y/n]: ").strip()
+        if response.lower() == 'n':
+            print("\n❌ Export cancelled.")
+            exit(0)
+
+        print("\n" + "="*60)
+        print("🚀 Starting export...")
+        print("="*60 + "\n")
+        reporter = SyncReporter(args.quiet, args.events)
+        try:
+            export_to_apkg(VAULT_PATH, DECK_NAME, args.output, jobs=args.jobs, reporter=reporter)
+        finally:
+            reporter.close()
+        return
+
     print(f"🔌 AnkiConnect URL: {ANKI_CONNECT_URL}")
 
+    if args.watch:
+        # Unattended: waits for Anki instead of exiting and never prompts
+        print("\n" + "="*60)
+        print("👀 Starting watch mode...")
+        print("="*60 + "\n")
+        reporter = SyncReporter(args.quiet, args.events)
+        try:
+            watch_and_sync(VAULT_PATH, DECK_NAME, batch_size=args.batch_size,
+                           concurrency=args.concurrency, jobs=args.jobs, prune=prune,
+                           dry_run=args.prune_dry_run, interval=args.interval,
+                           target_latency=args.target_latency, reporter=reporter)
+        finally:
+            reporter.close()
+        return
+
     # Test AnkiConnect connection
     print("\n" + "-"*60)
     print("Testing AnkiConnect connection...")
@@ -498,7 +3060,15 @@ if __name__ == "__main__":
         print("🚀 Starting sync...")
         print("="*60 + "\n")
 
-        sync_to_anki(VAULT_PATH, DECK_NAME)
+        reporter = SyncReporter(args.quiet, args.events)
+        try:
+            sync_to_anki(VAULT_PATH, DECK_NAME, batch_size=args.batch_size, full=args.full,
+                         concurrency=args.concurrency, jobs=args.jobs,
+                         prune=prune, dry_run=args.prune_dry_run,
+                         target_latency=args.target_latency, metrics_path=args.metrics,
+                         reporter=reporter)
+        finally:
+            reporter.close()
 
         print("\n" + "="*60)
         print("✅ Sync complete!")
@@ -506,4 +3076,8 @@ if __name__ == "__main__":
         print("\n💡 Tip: Open Anki to review your new cards!")
     else:
         print("\n❌ Sync cancelled.")
-        exit(0)
\ No newline at end of file
+        exit(0)
+
+
+if __name__ == "__main__":
+    main()
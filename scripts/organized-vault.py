@@ -15,15 +15,31 @@ import os
 import sys
 import shutil
 import re
+import json
+import mmap
+import sqlite3
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Set, Dict, Tuple, List, Optional
+from typing import Set, Dict, Tuple, List, Optional, Iterator
 
 # Configuration
 VAULT_PATH = Path(__file__).parent.parent.resolve()
 LOG_DIR = VAULT_PATH / "scripts" / "logs"
 
+# Tags found in each markdown file, reused while the file is unchanged
+INDEX_PATH = VAULT_PATH / "scripts" / "organizer-index.sqlite"
+
+# Move plan written by --plan (and by --interactive, between its dry run
+# and the real run) and read back by --apply
+PLAN_PATH = VAULT_PATH / "scripts" / "organizer-plan.json"
+PLAN_VERSION = 1
+
+# Plan entry kinds and the summary counter each one adds to
+PLAN_KINDS = {'pdf': 'pdf_moved', 'image': 'images_moved', 'tagged': 'tagged_moved'}
+
 # Folder mappings
 FOLDERS = {
     'pdf': 'pdf',
@@ -49,9 +65,23 @@ TAG_FOLDER_MAP = [
     ('#projects', 'projects')
 ]
 
+# Worker threads reading notes (--jobs). Reading is I/O bound, so more
+# workers than cores help on synced or network folders
+JOBS = 1
+
 # Folders to skip during organization
 SKIP_FOLDERS = {'.obsidian', '.trash', '.git', 'scripts', 'templates'}
 
+# Markdown files are scanned for tags in chunks of SCAN_CHUNK_SIZE bytes;
+# files larger than MMAP_THRESHOLD are memory-mapped instead
+SCAN_CHUNK_SIZE = 64 * 1024
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+FRONTMATTER_PATTERN = re.compile(rb'^---\s*\n(.*?)\n---', re.DOTALL)
+# A tag starts a line or follows whitespace, so URL fragments don't count
+INLINE_TAG_PATTERN = re.compile(rb'#(?<![^\s]#)[a-zA-Z0-9_-]+')
+TAG_CHARS = b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+
 
 def setup_logging(silent: bool = False) -> logging.Logger:
     """Setup logging configuration"""
@@ -106,45 +136,260 @@ def create_folders(vault_path: Path, logger: logging.Logger) -> None:
             raise
 
 
-def find_tags_in_file(file_path: Path, logger: logging.Logger) -> Set[str]:
-    """Extract tags from a markdown file, including frontmatter tags"""
+def parse_frontmatter_tags(frontmatter: str) -> Set[str]:
+    """Tags listed in a YAML frontmatter block"""
     tags = set()
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-
-        # Check for YAML frontmatter tags
-        frontmatter_match = re.match(r'^---\s*\n(.*?)\n---', content, re.DOTALL)
-        if frontmatter_match:
-            frontmatter = frontmatter_match.group(1)
-
-            # Look for tags in array format: tags: [tag1, tag2]
-            yaml_array_tags = re.findall(r'tags:\s*\[([^\]]+)\]', frontmatter)
-            for tag_list in yaml_array_tags:
-                for tag in tag_list.split(','):
-                    tag = tag.strip().strip('"').strip("'")
-                    if tag:
-                        tags.add(f'#{tag}' if not tag.startswith('#') else tag)
-
-            # Look for tags in simple format: tags: tag1, tag2
-            yaml_simple_tags = re.findall(r'tags:\s*([^\[\n]+)', frontmatter)
-            for tag_line in yaml_simple_tags:
-                if '[' not in tag_line:  # Skip array format already handled
-                    for tag in tag_line.split(','):
-                        tag = tag.strip().strip('"').strip("'")
-                        if tag:
-                            tags.add(f'#{tag}' if not tag.startswith('#') else tag)
-
-        # Find all inline tags in the format #tagname
-        inline_tags = re.findall(r'#[a-zA-Z0-9_-]+', content)
-        tags.update(inline_tags)
 
-    except Exception as e:
-        logger.warning(f"Could not read {file_path.name}: {e}")
+    # Look for tags in array format: tags: [tag1, tag2]
+    yaml_array_tags = re.findall(r'tags:\s*\[([^\]]+)\]', frontmatter)
+    for tag_list in yaml_array_tags:
+        for tag in tag_list.split(','):
+            tag = tag.strip().strip('"').strip("'")
+            if tag:
+                tags.add(f'#{tag}' if not tag.startswith('#') else tag)
+
+    # Look for tags in simple format: tags: tag1, tag2
+    yaml_simple_tags = re.findall(r'tags:\s*([^\[\n]+)', frontmatter)
+    for tag_line in yaml_simple_tags:
+        if '[' not in tag_line:  # Skip array format already handled
+            for tag in tag_line.split(','):
+                tag = tag.strip().strip('"').strip("'")
+                if tag:
+                    tags.add(f'#{tag}' if not tag.startswith('#') else tag)
 
     return tags
 
 
+def tag_boundary(data: bytes) -> int:
+    """Offset where a tag that may continue past the end of `data` starts"""
+    run_start = len(data.rstrip(TAG_CHARS + b'#'))
+    hash_at = data.rfind(b'#', run_start)
+    return hash_at if hash_at >= 0 else len(data)
+
+
+def iter_chunked_tags(f, head: bytes, pattern: re.Pattern = INLINE_TAG_PATTERN) -> Iterator[bytes]:
+    """Tags matching `pattern` in a file read in SCAN_CHUNK_SIZE chunks after `head`
+
+    A tag cut in two by a chunk boundary is carried over to the next chunk,
+    with the byte before it so the pattern can check what precedes the tag.
+    """
+    carry, start = head, 0
+    while True:
+        chunk = f.read(SCAN_CHUNK_SIZE)
+        if not chunk:
+            for match in pattern.finditer(carry, start):
+                yield match.group()
+            return
+        data = carry + chunk
+        cut = tag_boundary(data)
+        for match in pattern.finditer(data, start, cut):
+            yield match.group()
+        carry, start = (data[cut - 1:], 1) if cut else (data, 0)
+
+
+def read_tags(file_path: Path, stop_tag: Optional[str] = None,
+              pattern: re.Pattern = INLINE_TAG_PATTERN) -> Tuple[Set[str], Set[str]]:
+    """Read a markdown file and return its (frontmatter tags, inline tags)
+
+    The frontmatter is parsed once, then the file is scanned for inline
+    tags matching `pattern` in chunks, or through `mmap` when it is larger
+    than MMAP_THRESHOLD. With `stop_tag`, reading stops as soon as that tag
+    is found, so the inline tags may be incomplete.
+    """
+    inline_tags = set()
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > MMAP_THRESHOLD:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            head = data
+        else:
+            data = None
+            head = f.read(SCAN_CHUNK_SIZE)
+            # The frontmatter must be complete before it is parsed
+            while head.startswith(b'---') and not FRONTMATTER_PATTERN.match(head):
+                chunk = f.read(SCAN_CHUNK_SIZE)
+                if not chunk:
+                    break
+                head += chunk
+
+        try:
+            frontmatter_match = FRONTMATTER_PATTERN.match(head)
+            frontmatter_tags = set()
+            if frontmatter_match:
+                frontmatter_tags = parse_frontmatter_tags(
+                    frontmatter_match.group(1).decode('utf-8', errors='ignore')
+                )
+            if stop_tag in frontmatter_tags:
+                return frontmatter_tags, inline_tags
+
+            if data is not None:
+                tags = (match.group() for match in pattern.finditer(data))
+            else:
+                tags = iter_chunked_tags(f, head, pattern)
+            stop = stop_tag.encode('utf-8') if stop_tag else None
+            try:
+                for tag in tags:
+                    inline_tags.add(tag.decode('utf-8'))
+                    if tag == stop:
+                        break
+            finally:
+                # Releases the scanner's hold on the mapped buffer
+                tags.close()
+        finally:
+            if data is not None:
+                data.close()
+
+    return frontmatter_tags, inline_tags
+
+
+class TagMatcher:
+    """Tag rules compiled into one regex that finds the winning folder
+
+    `rules` are (tag, folder) pairs in priority order, like TAG_FOLDER_MAP.
+    A tag only counts at the start of a line or after whitespace and must
+    end there (`#developer/python` counts, `#developers` doesn't), so
+    URL fragments such as `page#developer` are not mistaken for tags.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str]]):
+        self.rules = list(rules)
+        self.ranks: Dict[str, int] = {}
+        for rank, (tag, _) in enumerate(self.rules):
+            self.ranks.setdefault(tag, rank)
+        self.top_tag = self.rules[0][0] if self.rules else None
+
+        names = sorted((tag[1:].encode('utf-8') for tag in self.ranks), key=len, reverse=True)
+        alternation = b'|'.join(re.escape(name) for name in names) or b'(?!)'
+        # Starting with the literal '#' lets the regex engine skip ahead to it
+        self.pattern = re.compile(rb'#(?<![^\s]#)(?:' + alternation + rb')(?![a-zA-Z0-9_-])')
+
+    def winner(self, tags: Set[str]) -> Optional[Tuple[str, str]]:
+        """(tag, folder) of the highest-priority rule among `tags`, if any"""
+        ranks = [self.ranks[tag] for tag in tags if tag in self.ranks]
+        return self.rules[min(ranks)] if ranks else None
+
+    def scan(self, file_path: Path) -> Tuple[Set[str], Set[str]]:
+        """(frontmatter tags, inline tags) of a markdown file that have a rule
+
+        Reading stops at the top-priority tag (see `read_tags`).
+        """
+        frontmatter_tags, inline_tags = read_tags(file_path, self.top_tag, self.pattern)
+        return ({tag for tag in frontmatter_tags if tag in self.ranks},
+                {tag for tag in inline_tags if tag in self.ranks})
+
+
+class TagIndex:
+    """Persistent SQLite index of the tags found in each markdown file
+
+    Rows are keyed by absolute path and hold the file's (inode, mtime, size)
+    signature. A file whose signature still matches is not read again; a
+    file that was renamed or moved within the vault is found by its
+    signature alone. Rows of files not seen during a run (moved out of the
+    scanned folders or deleted) are dropped by `close`.
+
+    Only tags that have a rule in `matcher` are stored, and reading a file
+    stops at the top-priority tag (see `TagMatcher.scan`), so the index
+    starts over whenever the rules change.
+
+    The rows are loaded into memory up front, so `tags` can be called from
+    worker threads; the database is only touched by `__init__` and `close`.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        inode INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        frontmatter_tags TEXT NOT NULL,
+        inline_tags TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    """
+
+    def __init__(self, index_path: Path, logger: logging.Logger, matcher: 'TagMatcher',
+                 rebuild: bool = False):
+        self.logger = logger
+        self.matcher = matcher
+        self.hits = 0
+        self.reads = 0
+        self._seen: Set[str] = set()
+        self._updates: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        if rebuild and index_path.exists():
+            index_path.unlink()
+            logger.info("🗃️  Rebuilding tag index")
+        try:
+            self.db = sqlite3.connect(str(index_path))
+            self.db.executescript(self.SCHEMA)
+        except sqlite3.DatabaseError as e:
+            # A corrupt index is only a cache: start over
+            logger.warning(f"Tag index unreadable, rebuilding: {e}")
+            self.db.close()
+            index_path.unlink()
+            self.db = sqlite3.connect(str(index_path))
+            self.db.executescript(self.SCHEMA)
+
+        rules = json.dumps(matcher.rules)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'rules'").fetchone()
+        if row is None or row[0] != rules:
+            self.db.execute("DELETE FROM files")
+            self.db.execute("DELETE FROM meta")
+            self.db.execute("INSERT INTO meta VALUES ('rules', ?)", (rules,))
+
+        self._rows: Dict[str, tuple] = {}
+        self._by_signature: Dict[tuple, tuple] = {}
+        for path, inode, mtime_ns, size, frontmatter_tags, inline_tags in self.db.execute(
+                "SELECT path, inode, mtime_ns, size, frontmatter_tags, inline_tags FROM files"):
+            tags = (json.loads(frontmatter_tags), json.loads(inline_tags))
+            self._rows[path] = ((inode, mtime_ns, size), tags)
+            if inode:
+                self._by_signature[(inode, mtime_ns, size)] = tags
+
+    def tags(self, file_path: Path) -> Set[str]:
+        """Tags of a markdown file that have a rule, read from disk only if it changed
+
+        Raises OSError if the file can't be read.
+        """
+        path = str(file_path)
+        self._seen.add(path)
+        stat = file_path.stat()
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        row = self._rows.get(path)
+        if row is not None and row[0] == signature:
+            tags, changed = row[1], False
+        else:
+            # Renamed or moved within the vault: same inode, mtime and size
+            tags, changed = (self._by_signature.get(signature) if signature[0] else None), True
+
+        read = tags is None
+        if read:
+            frontmatter_tags, inline_tags = self.matcher.scan(file_path)
+            tags = (sorted(frontmatter_tags), sorted(inline_tags))
+        with self._lock:
+            if read:
+                self.reads += 1
+            else:
+                self.hits += 1
+            if changed:
+                self._updates[path] = (signature, tags)
+        return set(tags[0]) | set(tags[1])
+
+    def close(self) -> None:
+        """Save new and changed rows, drop rows of files that weren't seen"""
+        self.db.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            [(path, *signature, json.dumps(tags[0]), json.dumps(tags[1]))
+             for path, (signature, tags) in self._updates.items()]
+        )
+        self.db.executemany("DELETE FROM files WHERE path = ?",
+                            [(path,) for path in self._rows if path not in self._seen])
+        self.db.commit()
+        self.db.close()
+
+
 def move_file(source: Path, destination_folder: str, vault_path: Path, logger: logging.Logger) -> Tuple[bool, Optional[Path]]:
     """Move a file to the destination folder with duplicate handling"""
     dest_dir = vault_path / destination_folder
@@ -203,38 +448,36 @@ def should_skip_folder(folder_path: Path, vault_path: Path) -> bool:
         return True
 
 
-def organize_vault(vault_path: Path, dry_run: bool = False, silent: bool = False) -> Dict[str, int]:
-    """Organize files in the Obsidian vault"""
-    logger = setup_logging(silent)
-
-    if not vault_path.exists():
-        logger.error(f"Vault path does not exist: {vault_path}")
-        sys.exit(1)
-
-    logger.info(f"{'[DRY RUN] ' if dry_run else ''}Starting organization of: {vault_path}")
-    logger.info(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    # Create folders
-    if not dry_run:
-        try:
-            create_folders(vault_path, logger)
-        except Exception as e:
-            logger.error(f"Failed to create folders: {e}")
-            sys.exit(1)
-
-    stats = {
-        'pdf_moved': 0,
-        'images_moved': 0,
-        'tagged_moved': 0,
-        'errors': 0,
-        'skipped': 0
+def plan_vault(vault_path: Path, logger: logging.Logger, rebuild_index: bool = False,
+               index_path: Optional[Path] = None, jobs: int = JOBS) -> Dict:
+    """Scan the vault and decide where every file goes, without moving anything
+
+    Markdown tags come from the `TagIndex` at `index_path` (default
+    INDEX_PATH), so only new or changed files are read; `rebuild_index`
+    starts it over. The vault is walked first, then the notes are read by
+    `jobs` worker threads, and the entries are listed in walk order, so
+    the plan doesn't depend on `jobs`.
+
+    Returns the move plan: the vault, the number of skipped files, the
+    index statistics and one entry per file to move with its `source` and
+    intended `destination` (relative to the vault), its `kind` ('pdf',
+    'image' or 'tagged'), the `reason` and, for notes, the `tags` found.
+    """
+    plan = {
+        'version': PLAN_VERSION,
+        'vault': str(vault_path),
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'skipped': 0,
+        'entries': [],
     }
 
-    processed_files: List[Tuple[str, str]] = []
+    matcher = TagMatcher(TAG_FOLDER_MAP)
+    index = TagIndex(index_path or INDEX_PATH, logger, matcher, rebuild=rebuild_index)
 
     # Walk through vault
     logger.info("Scanning vault...")
 
+    candidates: List[Path] = []
     try:
         for root, dirs, files in os.walk(vault_path):
             root_path = Path(root)
@@ -248,80 +491,247 @@ def organize_vault(vault_path: Path, dry_run: bool = False, silent: bool = False
             for file in files:
                 # Skip hidden files
                 if file.startswith('.'):
-                    stats['skipped'] += 1
+                    plan['skipped'] += 1
                     continue
 
                 # Skip CLAUDE.md files (documentation for Claude Code)
                 if file == 'CLAUDE.md':
-                    stats['skipped'] += 1
+                    plan['skipped'] += 1
                     logger.debug(f"Skipping CLAUDE.md at: {root_path.relative_to(vault_path)}")
                     continue
 
-                file_path = root_path / file
-                file_ext = file_path.suffix.lower()
-
-                try:
-                    # Check if it's a PDF
-                    if file_ext == '.pdf':
-                        logger.info(f"📄 PDF: {file}")
-                        if not dry_run:
-                            success, _ = move_file(file_path, FOLDERS['pdf'], vault_path, logger)
-                            if success:
-                                stats['pdf_moved'] += 1
-                                processed_files.append((file, FOLDERS['pdf']))
-                            else:
-                                stats['errors'] += 1
-                        else:
-                            logger.info(f"  → Would move to: {FOLDERS['pdf']}/")
-                            stats['pdf_moved'] += 1
-
-                    # Check if it's an image
-                    elif file_ext in IMAGE_EXTENSIONS:
-                        logger.info(f"🖼️  Image: {file}")
-                        if not dry_run:
-                            success, _ = move_file(file_path, FOLDERS['media'], vault_path, logger)
-                            if success:
-                                stats['images_moved'] += 1
-                                processed_files.append((file, FOLDERS['media']))
-                            else:
-                                stats['errors'] += 1
-                        else:
-                            logger.info(f"  → Would move to: {FOLDERS['media']}/")
-                            stats['images_moved'] += 1
-
-                    # Check markdown files for tags
-                    elif file_ext == '.md':
-                        tags = find_tags_in_file(file_path, logger)
-
-                        if tags:
-                            # Check each tag mapping in priority order
-                            for tag, folder in TAG_FOLDER_MAP:
-                                if tag in tags:
-                                    all_tags = ', '.join(sorted(tags))
-                                    logger.info(f"🏷️  Tagged file: {file}")
-                                    logger.debug(f"  Tags found: {all_tags}")
-                                    logger.debug(f"  Matching tag: {tag}")
-
-                                    if not dry_run:
-                                        success, _ = move_file(file_path, FOLDERS[folder], vault_path, logger)
-                                        if success:
-                                            stats['tagged_moved'] += 1
-                                            processed_files.append((file, FOLDERS[folder]))
-                                        else:
-                                            stats['errors'] += 1
-                                    else:
-                                        logger.info(f"  → Would move to: {FOLDERS[folder]}/")
-                                        stats['tagged_moved'] += 1
-                                    break  # Only move to first matching tag folder
-
-                except Exception as e:
-                    logger.error(f"Error processing {file}: {e}")
-                    stats['errors'] += 1
+                candidates.append(root_path / file)
 
     except Exception as e:
         logger.error(f"Fatal error during vault scan: {e}")
+        index.close()
+        sys.exit(1)
+
+    # Classify: read the tags of every note, in parallel since it's I/O bound
+    def read_note_tags(file_path: Path) -> Tuple[Set[str], Optional[Exception]]:
+        try:
+            return index.tags(file_path), None
+        except Exception as e:
+            return set(), e
+
+    notes = [file_path for file_path in candidates if file_path.suffix.lower() == '.md']
+    if jobs > 1:
+        logger.info(f"Reading {len(notes)} notes with {jobs} workers...")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            note_tags = dict(zip(notes, pool.map(read_note_tags, notes)))
+    finally:
+        index.close()
+    plan['notes_read'] = index.reads
+    plan['notes_from_index'] = index.hits
+
+    def add_entry(file_path: Path, kind: str, folder: str, reason: str, tags: Optional[Set[str]] = None):
+        entry = {
+            'source': file_path.relative_to(vault_path).as_posix(),
+            'destination': f"{FOLDERS[folder]}/{file_path.name}",
+            'kind': kind,
+            'reason': reason,
+        }
+        if tags is not None:
+            entry['tags'] = sorted(tags)
+        plan['entries'].append(entry)
+
+    for file_path in candidates:
+        file_ext = file_path.suffix.lower()
+
+        if file_ext == '.pdf':
+            add_entry(file_path, 'pdf', 'pdf', 'PDF file')
+
+        elif file_ext in IMAGE_EXTENSIONS:
+            add_entry(file_path, 'image', 'media', f"image ({file_ext})")
+
+        elif file_ext == '.md':
+            tags, error = note_tags[file_path]
+            if error is not None:
+                logger.warning(f"Could not read {file_path.name}: {error}")
+            # Only move to the first matching tag folder
+            winner = matcher.winner(tags)
+            if winner:
+                tag, folder = winner
+                add_entry(file_path, 'tagged', folder, f"tag {tag}", tags)
+
+    return plan
+
+
+def save_plan(plan: Dict, plan_path: Path) -> None:
+    """Write a move plan as JSON (atomically, so a crash never leaves half a plan)"""
+    plan_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = plan_path.with_name(plan_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, plan_path)
+
+
+def is_plan(plan) -> bool:
+    """Whether `plan` is a move plan this version understands
+
+    Only the version, the vault and the list of entries are required; each
+    entry is checked by `check_plan_entry` when the plan is applied.
+    """
+    return (isinstance(plan, dict) and plan.get('version') == PLAN_VERSION
+            and isinstance(plan.get('vault'), str)
+            and isinstance(plan.get('entries'), list))
+
+
+def load_plan(plan_path: Path) -> Dict:
+    """Read a move plan written by `save_plan`
+
+    Raises ValueError if the file isn't a plan this version understands.
+    """
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if not is_plan(plan):
+        raise ValueError(f"{plan_path} is not a version {PLAN_VERSION} move plan")
+    return plan
+
+
+def check_plan_entry(entry: Dict, vault_path: Path) -> Optional[str]:
+    """What is wrong with a (possibly hand-edited) plan entry, or None
+
+    The `kind` must be known, the `destination` one of the FOLDERS with the
+    source's file name, and the `source` a file inside the vault that a
+    scan could have planned (not in a hidden, skipped or organized folder).
+    """
+    if not isinstance(entry, dict) or not all(
+        isinstance(entry.get(key), str) for key in ('source', 'destination', 'kind')
+    ):
+        return "needs a source, a destination and a kind"
+    if entry['kind'] not in PLAN_KINDS:
+        return f"unknown kind {entry['kind']!r}"
+
+    folder, _, name = entry['destination'].rpartition('/')
+    if folder not in FOLDERS.values():
+        return f"destination {entry['destination']!r} is not in one of the organized folders"
+
+    root = vault_path.resolve()
+    source = (root / entry['source']).resolve()
+    try:
+        source.relative_to(root)
+    except ValueError:
+        return f"source {entry['source']!r} is outside the vault"
+    if should_skip_folder(source.parent, root):
+        return f"source {entry['source']!r} is in a folder that is never organized"
+    if name != source.name:
+        return f"destination {entry['destination']!r} must keep the file name {source.name!r}"
+    return None
+
+
+def execute_plan(plan: Dict, vault_path: Path, logger: logging.Logger,
+                 dry_run: bool = False) -> Tuple[Dict[str, int], List[Tuple[str, str]]]:
+    """Apply a move plan as is, without rescanning the vault
+
+    Files are moved one at a time in plan order, so duplicate renames are
+    deterministic. Entries that fail `check_plan_entry` are not acted on,
+    and they count as errors like sources that no longer exist.
+    Returns (stats, processed_files).
+    """
+    stats = {
+        'pdf_moved': 0,
+        'images_moved': 0,
+        'tagged_moved': 0,
+        'errors': 0,
+        'skipped': plan.get('skipped', 0)
+    }
+    processed_files: List[Tuple[str, str]] = []
+
+    for number, entry in enumerate(plan['entries'], 1):
+        problem = check_plan_entry(entry, vault_path)
+        if problem:
+            logger.error(f"Invalid plan entry {number}: {problem}")
+            stats['errors'] += 1
+            continue
+
+        file_path = vault_path / entry['source']
+        file = file_path.name
+        folder = entry['destination'].rsplit('/', 1)[0]
+
+        if entry['kind'] == 'pdf':
+            logger.info(f"📄 PDF: {file}")
+        elif entry['kind'] == 'image':
+            logger.info(f"🖼️  Image: {file}")
+        else:
+            logger.info(f"🏷️  Tagged file: {file}")
+            logger.debug(f"  Tags found: {', '.join(entry.get('tags', []))}")
+            logger.debug(f"  Matching {entry.get('reason', entry['kind'])}")
+
+        if dry_run:
+            logger.info(f"  → Would move to: {folder}/")
+            stats[PLAN_KINDS[entry['kind']]] += 1
+            continue
+
+        if not file_path.exists():
+            logger.error(f"Planned file no longer exists: {entry['source']}")
+            stats['errors'] += 1
+            continue
+
+        try:
+            success, _ = move_file(file_path, folder, vault_path, logger)
+            if success:
+                stats[PLAN_KINDS[entry['kind']]] += 1
+                processed_files.append((file, folder))
+            else:
+                stats['errors'] += 1
+        except Exception as e:
+            logger.error(f"Error processing {file}: {e}")
+            stats['errors'] += 1
+
+    return stats, processed_files
+
+
+def organize_vault(vault_path: Path, dry_run: bool = False, silent: bool = False,
+                   rebuild_index: bool = False, index_path: Optional[Path] = None,
+                   jobs: int = JOBS, plan: Optional[Dict] = None,
+                   plan_path: Optional[Path] = None) -> Dict[str, int]:
+    """Organize files in the Obsidian vault
+
+    Builds a move plan with `plan_vault` (unless a `plan` is given, which is
+    then applied without rescanning), optionally saves it to `plan_path`,
+    and applies it with `execute_plan` (or only lists it with `dry_run`).
+    """
+    logger = setup_logging(silent)
+
+    if not vault_path.exists():
+        logger.error(f"Vault path does not exist: {vault_path}")
         sys.exit(1)
 
+    logger.info(f"{'[DRY RUN] ' if dry_run else ''}Starting organization of: {vault_path}")
+    logger.info(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    scanned = plan is None
+    if scanned:
+        plan = plan_vault(vault_path, logger, rebuild_index, index_path, jobs)
+    else:
+        if not is_plan(plan):
+            logger.error(f"Not a version {PLAN_VERSION} move plan")
+            sys.exit(1)
+        if Path(plan['vault']) != vault_path:
+            logger.error(f"Move plan is for another vault: {plan['vault']}")
+            sys.exit(1)
+        logger.info(f"Applying move plan from {plan.get('created', 'unknown time')} "
+                    f"({len(plan['entries'])} files)")
+
+    if plan_path is not None:
+        try:
+            save_plan(plan, plan_path)
+            logger.info(f"📝 Move plan written to: {plan_path}")
+        except OSError as e:
+            logger.error(f"Could not write move plan {plan_path}: {e}")
+
+    # Create folders
+    if not dry_run:
+        try:
+            create_folders(vault_path, logger)
+        except Exception as e:
+            logger.error(f"Failed to create folders: {e}")
+            sys.exit(1)
+
+    stats, processed_files = execute_plan(plan, vault_path, logger, dry_run)
+
     # Print summary
     logger.info("=" * 60)
     logger.info("📊 ORGANIZATION SUMMARY")
@@ -330,6 +740,9 @@ def organize_vault(vault_path: Path, dry_run: bool = False, silent: bool = False
     logger.info(f"🖼️  Images organized: {stats['images_moved']}")
     logger.info(f"🏷️  Tagged files organized: {stats['tagged_moved']}")
     logger.info(f"⏭️  Files skipped: {stats['skipped']}")
+    if scanned:
+        logger.info(f"🗃️  Markdown files read: {plan['notes_read']} "
+                    f"(unchanged, from index: {plan['notes_from_index']})")
     logger.info(f"❌ Errors encountered: {stats['errors']}")
     logger.info("-" * 60)
     total = stats['pdf_moved'] + stats['images_moved'] + stats['tagged_moved']
@@ -369,6 +782,32 @@ def main():
         action='store_true',
         help='Interactive mode with prompts (legacy behavior)'
     )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=JOBS,
+        help=f'Worker threads reading notes, e.g. 8 for a synced vault (default: {JOBS})'
+    )
+    parser.add_argument(
+        '--rebuild-index',
+        action='store_true',
+        help='Discard the tag index and read every markdown file again'
+    )
+    parser.add_argument(
+        '--plan',
+        nargs='?',
+        const=str(PLAN_PATH),
+        metavar='PATH',
+        help='Also write the move plan as JSON (default: scripts/organizer-plan.json); '
+             'with --dry-run, review it before anything moves'
+    )
+    parser.add_argument(
+        '--apply',
+        nargs='?',
+        const=str(PLAN_PATH),
+        metavar='PATH',
+        help='Apply a saved move plan without rescanning the vault'
+    )
 
     args = parser.parse_args()
 
@@ -391,25 +830,34 @@ def main():
 
         if response.lower() != 'n':
             print("\n🔍 DRY RUN MODE - No files will be moved\n")
-            organize_vault(VAULT_PATH, dry_run=True, silent=False)
+            # The vault is scanned once: the real run applies the reviewed plan
+            plan_path = Path(args.plan) if args.plan else PLAN_PATH
+            organize_vault(VAULT_PATH, dry_run=True, silent=False,
+                           rebuild_index=args.rebuild_index, jobs=args.jobs,
+                           plan_path=plan_path)
 
             response = input("\n✅ Proceed with actual organization? [y/N]: ")
             if response.lower() == 'y':
-                organize_vault(VAULT_PATH, dry_run=False, silent=False)
+                organize_vault(VAULT_PATH, dry_run=False, silent=False,
+                               plan=load_plan(plan_path))
                 print("\n✅ Organization complete!")
             else:
                 print("\n❌ Organization cancelled.")
         else:
             response = input("⚠️  Skip dry run and proceed? [y/N]: ")
             if response.lower() == 'y':
-                organize_vault(VAULT_PATH, dry_run=False, silent=False)
+                organize_vault(VAULT_PATH, dry_run=False, silent=False,
+                               rebuild_index=args.rebuild_index, jobs=args.jobs)
                 print("\n✅ Organization complete!")
             else:
                 print("\n❌ Organization cancelled.")
     else:
         # Non-interactive mode (for Shell Commands plugin)
         try:
-            stats = organize_vault(VAULT_PATH, dry_run=args.dry_run, silent=args.silent)
+            plan = load_plan(Path(args.apply)) if args.apply else None
+            stats = organize_vault(VAULT_PATH, dry_run=args.dry_run, silent=args.silent,
+                                   rebuild_index=args.rebuild_index, jobs=args.jobs,
+                                   plan=plan, plan_path=Path(args.plan) if args.plan else None)
 
             # Exit code based on errors
             if stats['errors'] > 0:
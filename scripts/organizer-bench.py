@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for organized-vault.py
+Generates synthetic notes and measures how fast organized-vault.py classifies them:
+- tags: notes/sec and MB/s for finding the winning tag folder with the
+  compiled TagMatcher against the original find-every-tag-then-loop approach,
+  on notes held in memory and on notes read from disk
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import shutil
+import tempfile
+import importlib.util
+from pathlib import Path
+
+# organized-vault.py lives next to this script (its name isn't importable)
+_spec = importlib.util.spec_from_file_location(
+    'organized_vault', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'organized-vault.py')
+)
+organizer = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(organizer)
+
+WORDS = (
+    "audit control budget ledger revenue expense account balance entry report "
+    "variable function module request response cache index parser token stream"
+).split()
+
+
+def legacy_winner(text):
+    """The original classification: collect every #tag, then walk TAG_FOLDER_MAP"""
+    tags = set(re.findall(r'#[a-zA-Z0-9_-]+', text))
+    for tag, folder in organizer.TAG_FOLDER_MAP:
+        if tag in tags:
+            return tag, folder
+    return None
+
+
+def compiled_winner(matcher, text):
+    """The same decision from in-memory bytes with the compiled TagMatcher pattern"""
+    best = None
+    for match in matcher.pattern.finditer(text):
+        rank = matcher.ranks[match.group().decode('utf-8')]
+        if best is None or rank < best:
+            best = rank
+            if rank == 0:
+                break
+    return matcher.rules[best] if best is not None else None
+
+
+def generate_note(rng, size):
+    """A note of about `size` bytes with headings, links, noise tags and maybe a mapped tag"""
+    tags = [tag for tag, _ in organizer.TAG_FOLDER_MAP]
+    lines = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.05:
+            line = f"## {rng.choice(WORDS).title()}"
+        elif roll < 0.052:
+            line = f"See https://example.com/{rng.choice(WORDS)}{rng.choice(tags)} for details"
+        elif roll < 0.10:
+            line = f"Color #{rng.randrange(16 ** 6):06x} and #{rng.choice(WORDS)}"
+        else:
+            line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+        lines.append(line)
+        length += len(line) + 1
+
+    # Most notes carry a mapped tag, anywhere in the note
+    if rng.random() < 0.7:
+        lines.insert(rng.randrange(len(lines) + 1), f"{rng.choice(WORDS)} {rng.choice(tags)}")
+    return '\n'.join(lines) + '\n'
+
+
+def bench(notes, classify, repeat):
+    """Seconds to classify every note `repeat` times, and the last results"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [classify(note) for note in notes]
+    return time.perf_counter() - started, results
+
+
+def run_tags(args):
+    rng = random.Random(args.seed)
+    print(f"🏗️  Generating {args.notes} notes of ~{args.size} KB...")
+    texts = [generate_note(rng, args.size * 1024) for _ in range(args.notes)]
+    encoded = [text.encode('utf-8') for text in texts]
+    megabytes = sum(len(data) for data in encoded) / (1024 * 1024)
+    matcher = organizer.TagMatcher(organizer.TAG_FOLDER_MAP)
+
+    work_path = tempfile.mkdtemp(prefix='organizer-bench-')
+    try:
+        paths = []
+        for i, data in enumerate(encoded):
+            path = Path(work_path) / f"note-{i:05d}.md"
+            path.write_bytes(data)
+            paths.append(path)
+
+        def legacy_file(path):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return legacy_winner(f.read())
+
+        runs = [
+            ('legacy', 'memory', texts, legacy_winner),
+            ('compiled', 'memory', encoded, lambda text: compiled_winner(matcher, text)),
+            ('legacy', 'files', paths, legacy_file),
+            ('compiled', 'files', paths, lambda path: matcher.winner(set.union(*matcher.scan(path)))),
+        ]
+        print(f"{'matcher':>9} {'input':>7} {'seconds':>9} {'notes/sec':>10} {'MB/s':>8}")
+        results = {}
+        for name, source, notes, classify in runs:
+            elapsed, results[name, source] = bench(notes, classify, args.repeat)
+            total = len(notes) * args.repeat
+            print(f"{name:>9} {source:>7} {elapsed:>9.2f} {total / elapsed:>10.0f} "
+                  f"{megabytes * args.repeat / elapsed:>8.1f}")
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    differ = sum(old != new for old, new in zip(results['legacy', 'memory'], results['compiled', 'memory']))
+    moved = sum(result is not None for result in results['compiled', 'memory'])
+    print(f"🏷️  {moved} of {args.notes} notes matched a rule; {differ} decisions differ from "
+          f"the legacy matcher (URL fragments and #hashes inside words no longer count)")
+    if results['compiled', 'memory'] != results['compiled', 'files']:
+        print("❌ In-memory and on-disk classification disagree")
+        sys.exit(1)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmarks for organized-vault.py')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    tags_parser = subparsers.add_parser('tags', help='Notes/sec for finding the winning tag folder')
+    tags_parser.add_argument('--notes', type=int, default=2000, help='Number of synthetic notes (default: 2000)')
+    tags_parser.add_argument('--size', type=int, default=64, help='Approximate note size in KB (default: 64)')
+    tags_parser.add_argument('--repeat', type=int, default=3, help='Times to classify each note (default: 3)')
+    tags_parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic notes')
+    tags_parser.set_defaults(func=run_tags)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()